@@ -0,0 +1,262 @@
+"""
+Batch solving of many sudoku grids.
+
+Reads one 81 character puzzle per line ('.' or '0' for empty boxes) and writes
+one line per puzzle, in input order, of the form
+
+    <status> <grid>
+
+where status is 'solved', 'unsolvable' or 'invalid'. The unit and peer tables
+of bitboard.py are built once when this module is imported and shared by every
+puzzle of the run, and by every puzzle a worker process solves when the
+puzzles are sharded across a process pool.
+
+Puzzle files may also hold the binary records of packed.py, read through a
+memory map with --format bin81 or bin41.
+
+Usage:
+    python batch.py puzzles.txt > solutions.txt
+    cat puzzles.txt | python batch.py --workers 8
+    python batch.py puzzles.bin --format bin41
+    python batch.py puzzles.txt --benchmark 1 2 4 8
+"""
+
+import argparse
+import functools
+import itertools
+import multiprocessing
+import os
+import sys
+from timeit import default_timer as timer
+
+import bitboard
+import packed
+import vectorized
+
+# Propagation choices: the modes of bitboard.py, and 'numpy' to propagate
+# whole chunks of puzzles at once with vectorized.py
+propagations = bitboard.propagations + ('numpy',)
+
+SOLVED = 'solved'
+UNSOLVABLE = 'unsolvable'
+INVALID = 'invalid'
+
+
+def parse_grid(grid):
+    """
+    Convert a puzzle line into candidate masks.
+    Args:
+        grid(string): 81 characters, digits for givens and '.' or '0' for empties.
+    Returns:
+        A list of 81 candidate masks, or None if the line is not a valid puzzle.
+    """
+    digits = packed.parse(grid)
+    return None if digits is None else packed.to_cells(digits)
+
+
+def solve_one(grid, propagation='queue'):
+    """
+    Solve a single puzzle line.
+    Args:
+        grid(string): a puzzle line.
+        propagation(string): one of bitboard.propagations.
+    Returns:
+        A (status, solution) tuple, solution being the solved 81 character grid or None.
+    """
+    cells = parse_grid(grid)
+    if cells is None:
+        return INVALID, None
+    solved = bitboard.solve_cells(cells, propagation)
+    if solved:
+        return SOLVED, bitboard.to_grid(solved)
+    return UNSOLVABLE, None
+
+
+def solve_block(grids):
+    """
+    Solve a list of puzzle lines together with the NumPy engine.
+    Returns:
+        A list of (status, solution) tuples, see solve_one().
+    """
+    parsed = [parse_grid(grid) for grid in grids]
+    solved = iter(vectorized.solve_block([cells for cells in parsed if cells is not None]))
+    results = []
+    for cells in parsed:
+        if cells is None:
+            results.append((INVALID, None))
+            continue
+        cells = next(solved)
+        results.append((SOLVED, bitboard.to_grid(cells)) if cells else (UNSOLVABLE, None))
+    return results
+
+
+def blocks_of(grids, size):
+    """Yield lists of up to size consecutive puzzles."""
+    grids = iter(grids)
+    while True:
+        block = list(itertools.islice(grids, size))
+        if not block:
+            return
+        yield block
+
+
+def worker_count(workers):
+    """Return the number of processes to use, 0 or None meaning one per core."""
+    return workers or os.cpu_count() or 1
+
+
+def solve_many(grids, workers=1, chunksize=64, propagation='queue'):
+    """
+    Solve an iterable of puzzle lines lazily.
+    Args:
+        grids: iterable of puzzle strings.
+        workers(int): number of processes, 1 solves in this process and 0 uses every core.
+        chunksize(int): puzzles sent to a worker at a time, and propagated
+            together with the 'numpy' propagation.
+        propagation(string): one of `propagations`.
+    Returns:
+        A generator of (status, solution) tuples in input order.
+    """
+    workers = worker_count(workers)
+    if propagation == 'numpy':
+        for block in solve_blocks(grids, workers, chunksize):
+            for result in block:
+                yield result
+        return
+    solver = functools.partial(solve_one, propagation=propagation)
+    if workers == 1:
+        for grid in grids:
+            yield solver(grid)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        # imap hands out chunks as workers free up but yields in input order
+        for result in pool.imap(solver, grids, chunksize):
+            yield result
+
+
+def solve_blocks(grids, workers, size):
+    """Yield the results of solve_block() on consecutive blocks, in input order."""
+    if workers == 1:
+        for block in blocks_of(grids, size):
+            yield solve_block(block)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        for results in pool.imap(solve_block, blocks_of(grids, size)):
+            yield results
+
+
+def write_results(grids, results, out):
+    """
+    Write one '<status> <grid>' line per puzzle to out.
+    Unsolved puzzles are echoed back as given.
+    Returns:
+        A dict counting the puzzles of each status.
+    """
+    counts = {SOLVED: 0, UNSOLVABLE: 0, INVALID: 0}
+    for grid, (status, solution) in zip(grids, results):
+        counts[status] += 1
+        out.write('{} {}\n'.format(status, solution or grid.strip()))
+    return counts
+
+
+def read_grids(source):
+    """Yield the non-blank lines of an open puzzle file."""
+    for line in source:
+        if line.strip():
+            yield line
+
+
+def open_grids(path, format='text'):
+    """
+    Yield the puzzles of a file as text lines.
+    Args:
+        path(string): the puzzle file, '-' for text lines on stdin.
+        format(string): one of packed.formats, 'text' for one puzzle per line.
+    """
+    if path == '-':
+        for line in read_grids(sys.stdin):
+            yield line
+    elif format == 'text':
+        for line in packed.read_lines(path):
+            yield line.decode('latin-1')
+    else:
+        with packed.PackedFile(path, packed.record_sizes[format]) as records:
+            for digits in records:
+                yield packed.to_grid(digits)
+
+
+def report(counts, elapsed, out=sys.stderr):
+    """Print the aggregate puzzle counts and throughput."""
+    total = sum(counts.values())
+    rate = total / elapsed if elapsed > 0 else float('inf')
+    out.write('{} puzzles ({} solved, {} unsolvable, {} invalid) in {:.3f}s: {:.1f} puzzles/s\n'.format(
+        total, counts[SOLVED], counts[UNSOLVABLE], counts[INVALID], elapsed, rate))
+
+
+def benchmark(grids, worker_counts, chunksize=64, propagation='queue', out=sys.stdout):
+    """
+    Solve the same puzzles once per worker count and print the throughput of each run.
+    Returns:
+        A list of (workers, puzzles per second) tuples.
+    """
+    rates = []
+    base = None
+    out.write('{:>8}  {:>14}  {:>8}\n'.format('workers', 'puzzles/s', 'speedup'))
+    for workers in worker_counts:
+        workers = worker_count(workers)
+        start = timer()
+        for _ in solve_many(grids, workers, chunksize, propagation):
+            pass
+        elapsed = timer() - start
+        rate = len(grids) / elapsed if elapsed > 0 else float('inf')
+        base = base or rate
+        rates.append((workers, rate))
+        out.write('{:>8d}  {:>14.1f}  {:>7.2f}x\n'.format(workers, rate, rate / base))
+    return rates
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve one sudoku puzzle per line.")
+    parser.add_argument('input', nargs='?', default='-',
+                        help="puzzle file, defaults to stdin")
+    parser.add_argument('-f', '--format', choices=packed.formats, default='text',
+                        help="puzzle file format, text lines or binary records (default text)")
+    parser.add_argument('-o', '--output', type=argparse.FileType('w'), default=sys.stdout,
+                        help="solution file, defaults to stdout")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="worker processes, 0 for one per core (default 1)")
+    parser.add_argument('-c', '--chunksize', type=int, default=64,
+                        help="puzzles handed to a worker at a time (default 64)")
+    parser.add_argument('-p', '--propagation', choices=propagations, default='queue',
+                        help="constraint propagation engine (default queue), "
+                             "numpy needs a large --chunksize to pay off")
+    parser.add_argument('-b', '--benchmark', type=int, nargs='*', metavar='WORKERS',
+                        help="only measure throughput for each worker count, "
+                             "defaults to powers of two up to the core count")
+    args = parser.parse_args(argv)
+    if args.input == '-' and args.format != 'text':
+        parser.error('binary records must be read from a file')
+
+    if args.benchmark is not None:
+        cores = worker_count(0)
+        counts = args.benchmark or [2 ** n for n in range(cores.bit_length()) if 2 ** n <= cores]
+        # Comment lines, like the headers of the corpora, are not puzzles to time
+        if args.format != 'text':
+            grids = list(open_grids(args.input, args.format))
+        elif args.input == '-':
+            grids = [line for line in read_grids(sys.stdin) if not line.startswith('#')]
+        else:
+            grids = packed.read_corpus(args.input)
+        benchmark(grids, counts, args.chunksize, args.propagation)
+        return
+
+    # Stream the puzzles: one copy is solved, the other echoed for unsolved lines
+    grids, echo = itertools.tee(open_grids(args.input, args.format))
+    start = timer()
+    counts = write_results(echo, solve_many(grids, args.workers, args.chunksize, args.propagation),
+                           args.output)
+    report(counts, timer() - start)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import batch
+import io
+import os
+import shutil
+import tempfile
+import testdata
+import unittest
+import unittest.mock
+
+
+class TestBatch(unittest.TestCase):
+    diagonal_grid = testdata.diagonal_grid
+    diagonal_solution = testdata.diagonal_solution
+
+    def test_solve_many_statuses_in_order(self):
+        grids = [self.diagonal_grid, '11' + '.' * 79, 'not a puzzle', self.diagonal_grid.replace('.', '0')]
+        self.assertEqual(list(batch.solve_many(grids)),
+                         [(batch.SOLVED, self.diagonal_solution),
+                          (batch.UNSOLVABLE, None),
+                          (batch.INVALID, None),
+                          (batch.SOLVED, self.diagonal_solution)])
+
+    def test_process_pool_keeps_order(self):
+        grids = [self.diagonal_grid, 'bad', '11' + '.' * 79] * 5
+        self.assertEqual(list(batch.solve_many(grids, workers=2, chunksize=2)),
+                         list(batch.solve_many(grids)))
+
+    def test_cli_streams_results(self):
+        source = io.StringIO(self.diagonal_grid + '\n\nbad\n')
+        out = io.StringIO()
+        grids = list(batch.read_grids(source))
+        counts = batch.write_results(grids, batch.solve_many(grids), out)
+        self.assertEqual(out.getvalue().splitlines(),
+                         ['solved ' + self.diagonal_solution, 'invalid bad'])
+        self.assertEqual(counts, {batch.SOLVED: 1, batch.UNSOLVABLE: 0, batch.INVALID: 1})
+
+    def test_benchmark_skips_comment_lines(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'puzzles.txt')
+            with open(path, 'w') as f:
+                f.write('# A corpus header\n{}\n'.format(self.diagonal_grid))
+            with unittest.mock.patch.object(batch, 'benchmark') as benchmark:
+                batch.main([path, '--benchmark', '1'])
+            self.assertEqual(benchmark.call_args[0][0], [self.diagonal_grid])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
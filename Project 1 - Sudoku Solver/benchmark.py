@@ -0,0 +1,252 @@
+"""
+Benchmark the solver engines on the bundled puzzle corpora.
+
+The corpora of the `corpora` directory hold one puzzle per line, lines starting
+with '#' being comments: 'easy', 'hard' and 'top95' are classic 9x9 sudokus,
+'diagonal' the diagonal sudokus of this project, and '16x16' is generated on
+the fly by scaling.make_puzzles() with a fixed seed. Every puzzle is solved,
+and the run reports per corpus the throughput, the latency percentiles, the
+search nodes and the propagation rounds. The engine is 'dict' for the
+dictionary engine of solution.py, whose nodes are those of its Branching
+policy and rounds the passes of reduce_puzzle(), one of the propagations of
+bitboard.py, 'sat' for the SAT solver of sat.py, whose nodes are its decisions
+and rounds its propagated literals, or 'dlx' for dancing links, whose nodes are
+the calls of its search and which has no propagation rounds. The 'dict' and
+'dlx' engines only solve diagonal 9x9 sudokus, so they only run the 'diagonal'
+corpus.
+
+The results can be written as JSON and a later run compared against them: a
+corpus whose throughput fell by more than the tolerance fails the run.
+
+Usage:
+    python benchmark.py --output baseline.json
+    python benchmark.py --baseline baseline.json --tolerance 0.2
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+from timeit import default_timer as timer
+
+import bitboard
+import dlx
+import packed
+import sat
+import scaling
+import solution
+from geometry import Geometry, standard
+
+# Corpus name: (file in packed.CORPUS_DIR or None if generated, square size, diagonal)
+corpora = {
+    'easy': ('easy.txt', 3, False),
+    'hard': ('hard.txt', 3, False),
+    'top95': ('top95.txt', 3, False),
+    'diagonal': ('diagonal.txt', 3, True),
+    '16x16': (None, 4, False),
+}
+
+# Generated corpora: puzzle count and share of empty boxes
+GENERATED_PUZZLES = 20
+GENERATED_EMPTY = 0.55
+
+PERCENTILES = (50, 90, 99)
+
+# The dictionary engine, the DFS engines of bitboard.py, the SAT solver and dancing links
+engines = ('dict',) + bitboard.propagations + ('sat', 'dlx')
+
+# Engines bound to the board of solution.py
+diagonal_engines = ('dict', 'dlx')
+
+
+def load_corpus(name):
+    """
+    Load a bundled corpus.
+    Args:
+        name(string): one of `corpora`.
+    Returns:
+        A (geometry, puzzles) tuple, each puzzle a list of candidate masks.
+    """
+    filename, size, diagonal = corpora[name]
+    geometry = Geometry(size, diagonal=diagonal)
+    if filename is None:
+        return geometry, scaling.make_puzzles(geometry, GENERATED_PUZZLES, GENERATED_EMPTY)
+    grids = packed.read_corpus(os.path.join(packed.CORPUS_DIR, filename))
+    return geometry, [geometry.grid_masks(grid) for grid in grids]
+
+
+def engine_corpora(propagation):
+    """Return the names of the corpora an engine can solve."""
+    if propagation not in diagonal_engines:
+        return list(corpora)
+    return [name for name, (_, size, diagonal) in corpora.items()
+            if size == standard.size and diagonal == standard.diagonal]
+
+
+def percentile(ordered, q):
+    """Return the nearest-rank q-th percentile of a sorted, non empty list."""
+    rank = max(1, -(-len(ordered) * q // 100))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(values):
+    """Return the mean, percentiles and maximum of a list of numbers."""
+    ordered = sorted(values)
+    summary = {'mean': sum(ordered) / len(ordered)}
+    for q in PERCENTILES:
+        summary['p{}'.format(q)] = percentile(ordered, q)
+    summary['max'] = ordered[-1]
+    return summary
+
+
+def run_corpus(name, propagation='trail', repeat=1):
+    """
+    Solve every puzzle of a corpus.
+    Args:
+        name(string): one of `corpora`.
+        propagation(string): one of `engines`.
+        repeat(int): solves per puzzle, the fastest one is kept.
+    Returns:
+        A dict with the puzzle and solved counts, the puzzles per second and
+        summaries of the latencies in milliseconds, nodes and rounds per puzzle.
+    """
+    if name not in engine_corpora(propagation):
+        raise ValueError('The {} engine cannot solve the {} corpus'.format(propagation, name))
+    geometry, puzzles = load_corpus(name)
+    if propagation in diagonal_engines:
+        # Both take grid strings; the conversion is kept out of the timings
+        puzzles = [geometry.to_grid(cells) for cells in puzzles]
+    if propagation == 'sat':
+        # The clauses of the board are built once, outside of the timings
+        sat.formula_for(geometry)
+    latencies, nodes, rounds = [], [], []
+    solved = 0
+    for cells in puzzles:
+        best = None
+        for _ in range(repeat):
+            stats = bitboard.SearchStats()
+            start = timer()
+            if propagation == 'dict':
+                branching = solution.Branching()
+                result = solution.solve_values(solution.grid_values(cells), branching=branching, stats=stats)
+                stats.nodes = branching.nodes
+            elif propagation == 'dlx':
+                result = dlx.solve_rows(cells, 1, stats)
+            elif propagation == 'sat':
+                result = sat.solve_cells(cells, geometry, stats)
+            else:
+                result = bitboard.solve_cells(cells[:], propagation, geometry, stats)
+            elapsed = timer() - start
+            best = elapsed if best is None else min(best, elapsed)
+        solved += bool(result)
+        latencies.append(best * 1000)
+        nodes.append(stats.nodes)
+        rounds.append(stats.rounds)
+    total = sum(latencies) / 1000
+    return {
+        'puzzles': len(puzzles),
+        'solved': solved,
+        'puzzles_per_second': len(puzzles) / total if total > 0 else float('inf'),
+        'latency_ms': summarize(latencies),
+        'nodes': summarize(nodes),
+        'rounds': summarize(rounds),
+    }
+
+
+def run(names=None, propagation='trail', repeat=1):
+    """
+    Benchmark several corpora.
+    Args:
+        names(list): corpus names, None for all of them the engine can solve.
+        propagation(string): one of `engines`.
+        repeat(int): solves per puzzle, the fastest one is kept.
+    Returns:
+        A JSON serializable dict of the run settings and the results of run_corpus() by corpus.
+    """
+    return {
+        'propagation': propagation,
+        'repeat': repeat,
+        'python': platform.python_version(),
+        'corpora': dict((name, run_corpus(name, propagation, repeat))
+                        for name in names or engine_corpora(propagation)),
+    }
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Find the corpora whose throughput regressed against a baseline run.
+    Args:
+        results(dict): a run() result.
+        baseline(dict): an earlier run() result.
+        tolerance(float): allowed relative drop of the puzzles per second.
+    Returns:
+        A list of messages, one per regressed corpus, empty if none regressed.
+    Raises:
+        ValueError if the two runs used different engines.
+    """
+    if results.get('propagation') != baseline.get('propagation'):
+        raise ValueError('Cannot compare the {} engine against a {} baseline'.format(
+            results.get('propagation'), baseline.get('propagation')))
+    regressions = []
+    for name, result in sorted(results['corpora'].items()):
+        if name not in baseline['corpora']:
+            continue
+        before = baseline['corpora'][name]['puzzles_per_second']
+        after = result['puzzles_per_second']
+        if after < before * (1 - tolerance):
+            regressions.append('{}: {:.1f} puzzles/s, baseline {:.1f} ({:+.1%})'.format(
+                name, after, before, after / before - 1))
+    return regressions
+
+
+def report(results, out=sys.stdout):
+    """Print one line of throughput, latencies, nodes and rounds per corpus."""
+    out.write('{:>9}  {:>7}  {:>10}  {:>8}  {:>8}  {:>8}  {:>8}  {:>9}  {:>9}\n'.format(
+        'corpus', 'solved', 'puzzles/s', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms', 'nodes', 'rounds'))
+    for name, result in results['corpora'].items():
+        latency = result['latency_ms']
+        out.write('{:>9}  {:>7}  {:>10.1f}  {:>8.2f}  {:>8.2f}  {:>8.2f}  {:>8.2f}  {:>9.1f}  {:>9.1f}\n'.format(
+            name, '{}/{}'.format(result['solved'], result['puzzles']), result['puzzles_per_second'],
+            latency['p50'], latency['p90'], latency['p99'], latency['max'],
+            result['nodes']['mean'], result['rounds']['mean']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the solver on the bundled corpora.")
+    parser.add_argument('-c', '--corpora', nargs='+', choices=sorted(corpora),
+                        help="corpora to run, defaults to all of them")
+    parser.add_argument('-p', '--propagation', choices=engines, default='trail',
+                        help="search engine (default trail)")
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help="solves per puzzle, the fastest is kept (default 3)")
+    parser.add_argument('-o', '--output', help="write the results as JSON to this file")
+    parser.add_argument('-b', '--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('-t', '--tolerance', type=float, default=0.2,
+                        help="allowed relative throughput drop against the baseline (default 0.2)")
+    args = parser.parse_args(argv)
+    unsupported = sorted(set(args.corpora or ()) - set(engine_corpora(args.propagation)))
+    if unsupported:
+        parser.error('the {} engine cannot solve {}'.format(args.propagation, ', '.join(unsupported)))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('propagation') != args.propagation:
+            parser.error('the baseline was run with the {} engine'.format(baseline.get('propagation')))
+
+    results = run(args.corpora, args.propagation, args.repeat)
+    report(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if baseline is not None:
+        regressions = compare(results, baseline, args.tolerance)
+        for message in regressions:
+            sys.stderr.write('Regression: {}\n'.format(message))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+import benchmark
+import bitboard
+import json
+import os
+import packed
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_bundled_corpora_have_unique_solutions(self):
+        for name in ('easy', 'diagonal'):
+            geometry, puzzles = benchmark.load_corpus(name)
+            self.assertTrue(puzzles)
+            for cells in puzzles:
+                self.assertEqual(bitboard.count_search(cells, 2, geometry=geometry), 1)
+
+    def test_percentiles(self):
+        self.assertEqual(benchmark.percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(benchmark.percentile([1, 2, 3, 4], 99), 4)
+        self.assertEqual(benchmark.percentile([7], 50), 7)
+        self.assertEqual(benchmark.summarize([3, 1, 2]),
+                         {'mean': 2, 'p50': 2, 'p90': 3, 'p99': 3, 'max': 3})
+
+    def test_run_records_nodes_and_rounds(self):
+        results = benchmark.run(['easy', '16x16'])
+        json.dumps(results)
+        for name in ('easy', '16x16'):
+            result = results['corpora'][name]
+            self.assertEqual(result['solved'], result['puzzles'])
+            self.assertGreaterEqual(result['nodes']['p50'], 1)
+            self.assertGreater(result['rounds']['mean'], 0)
+            self.assertLessEqual(result['latency_ms']['p50'], result['latency_ms']['max'])
+
+    def test_every_engine_round_trips_through_json(self):
+        self.assertEqual(benchmark.engine_corpora('dlx'), ['diagonal'])
+        self.assertRaises(ValueError, benchmark.run_corpus, 'easy', 'dict')
+        # A few diagonal puzzles, the whole corpus is slow on the dict engine
+        grids = packed.read_corpus(os.path.join(packed.CORPUS_DIR, 'diagonal.txt'))[:3]
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'diagonal.txt')
+            with open(path, 'w') as f:
+                f.write('\n'.join(grids))
+            corpora = dict(benchmark.corpora, diagonal=(path, 3, True))
+            with unittest.mock.patch.object(benchmark, 'corpora', corpora):
+                for engine in benchmark.engines:
+                    results = benchmark.run(['diagonal'], engine)
+                    baseline = json.loads(json.dumps(results))
+                    self.assertEqual(baseline['propagation'], engine)
+                    self.assertEqual(baseline['corpora']['diagonal']['solved'], len(grids))
+                    self.assertGreaterEqual(baseline['corpora']['diagonal']['nodes']['p50'], 1)
+                    self.assertEqual(benchmark.compare(results, baseline, 0.2), [])
+        finally:
+            shutil.rmtree(directory)
+        self.assertRaises(ValueError, benchmark.compare, {'propagation': 'dict', 'corpora': {}},
+                          {'propagation': 'trail', 'corpora': {}})
+
+    def test_compare_flags_throughput_drops(self):
+        def results(rates):
+            return {'corpora': dict((name, {'puzzles_per_second': rate}) for name, rate in rates.items())}
+        baseline = results({'easy': 1000.0, 'hard': 100.0})
+        self.assertEqual(benchmark.compare(results({'easy': 900.0, 'hard': 100.0}), baseline, 0.2), [])
+        regressions = benchmark.compare(results({'easy': 700.0, 'top95': 1.0}), baseline, 0.2)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith('easy:'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,481 @@
+"""
+Bitmask board engine for the diagonal sudoku solver.
+
+The dictionary board in solution.py keeps the remaining digits of a box as a
+string. Here a board is a flat list of 81 integers indexed in `boxes` order,
+where bit d-1 is set while digit d is still possible for that box. Units and
+peers are precomputed once as tuples of indices, so no dictionary is built
+until the solved board is converted back with `to_values`.
+
+The propagation and search functions take an optional geometry.Geometry to
+solve 16x16 and 25x25 boards; the module level tables are those of the
+diagonal 9x9 sudoku.
+"""
+
+import itertools
+
+from geometry import standard
+# The budget of a search, shared with the dictionary engine
+from solution import BudgetExhausted, SearchStats
+
+boxes = standard.boxes
+digits = ''.join(standard.symbols)
+
+# Every digit still possible
+ALL = standard.ALL
+
+# Index of each box name in the flat board
+box_index = standard.box_index
+
+# Units and peers as index tuples
+unit_cells = standard.unit_cells
+peer_cells = standard.peer_cells
+cell_units = standard.cell_units
+
+# Lookup tables over all 512 masks
+bit_count = standard.bit_count
+mask_digits = tuple(''.join(d for n, d in enumerate(digits) if m >> n & 1)
+                    for m in range(ALL + 1))
+digit_mask = dict((d, 1 << n) for n, d in enumerate(digits))
+
+
+def grid_masks(grid):
+    """
+    Convert grid into a list of 81 candidate masks, ALL for empties.
+    Args:
+        grid(string) - A grid in string form.
+    Returns:
+        A list of integers in `boxes` order.
+    """
+    cells = []
+    for c in grid:
+        if c in digit_mask:
+            cells.append(digit_mask[c])
+        elif c == '.':
+            cells.append(ALL)
+    # Nine by nine grid
+    assert len(cells) == 81
+    return cells
+
+
+def to_values(cells):
+    """Convert a list of candidate masks into the dictionary form of solution.py."""
+    return dict(zip(boxes, (mask_digits[m] for m in cells)))
+
+
+def to_grid(cells):
+    """Convert a list of candidate masks into an 81 character grid string, '.' for unsolved boxes."""
+    return ''.join(mask_digits[m] if bit_count[m] == 1 else '.' for m in cells)
+
+
+def eliminate(cells, geometry=standard):
+    """
+    Remove the digits of the solved boxes of every unit from the other boxes.
+    Args:
+        cells(list): candidate masks, updated in place.
+        geometry(Geometry): the board layout.
+    Returns:
+        The candidate masks, or False if two boxes of a unit hold the same digit.
+    """
+    ALL, bit_count = geometry.ALL, geometry.bit_count
+    for unit in geometry.unit_cells:
+        solved = 0
+        for i in unit:
+            m = cells[i]
+            if bit_count[m] == 1:
+                if solved & m:
+                    return False
+                solved |= m
+        if solved:
+            keep = ALL ^ solved
+            for i in unit:
+                m = cells[i]
+                if m & solved and bit_count[m] > 1:
+                    cells[i] = m & keep
+    return cells
+
+
+def only_choice(cells, geometry=standard):
+    """
+    Assign every digit that only fits in one box of a unit.
+    Args:
+        cells(list): candidate masks, updated in place.
+        geometry(Geometry): the board layout.
+    Returns:
+        The candidate masks, or False if a unit can no longer hold every digit
+        or a box is the only place for two different digits.
+    """
+    ALL, bit_count = geometry.ALL, geometry.bit_count
+    for unit in geometry.unit_cells:
+        # Digits seen at least once and at least twice in this unit
+        once = twice = 0
+        for i in unit:
+            m = cells[i]
+            twice |= once & m
+            once |= m
+        if once != ALL:
+            return False
+        only = once & ~twice
+        if only:
+            for i in unit:
+                hit = cells[i] & only
+                if hit:
+                    if bit_count[hit] > 1:
+                        return False
+                    cells[i] = hit
+    return cells
+
+
+def solved_count(cells, geometry=standard):
+    """Return the number of boxes with a single candidate."""
+    bit_count = geometry.bit_count
+    return sum(1 for m in cells if bit_count[m] == 1)
+
+
+def reduce_puzzle(cells, changed=None, geometry=standard, stats=None):
+    """
+    Iterate eliminate() and only_choice() until no more boxes get solved.
+    Args:
+        cells(list): candidate masks, updated in place.
+        changed: ignored, every sweep covers the whole board. Accepted so that
+            reduce_puzzle and propagate can be swapped in search().
+        geometry(Geometry): the board layout.
+        stats(SearchStats): if given, counts one round per sweep and checks
+            its deadline before each.
+    Returns:
+        The candidate masks, or False if a box ran out of candidates.
+    """
+    solved_after = solved_count(cells, geometry)
+    while True:
+        if stats is not None:
+            stats.rounds += 1
+            stats.check()
+        solved_before = solved_after
+        if (eliminate(cells, geometry) is False or 0 in cells
+                or only_choice(cells, geometry) is False):
+            return False
+        solved_after = solved_count(cells, geometry)
+        if solved_before == solved_after:
+            return cells
+
+
+def propagate(cells, changed=None, trail=None, geometry=standard, stats=None):
+    """
+    Propagate eliminations and only choices from the boxes that changed.
+
+    Unlike reduce_puzzle() this never sweeps the board: a work list holds the
+    boxes that became solved and still have to be removed from their peers, and
+    a set holds the units containing a box whose candidates shrank, which are
+    the only units where a new only choice can appear.
+    Args:
+        cells(list): candidate masks, updated in place.
+        changed: indices of the boxes changed since the board was last
+            propagated, None for every box.
+        trail(list): if given, an (index, old mask) pair is appended before every
+            write so the changes can be rolled back with undo().
+        geometry(Geometry): the board layout.
+        stats(SearchStats): if given, counts one round per unit scanned and
+            checks its deadline before each.
+    Returns:
+        The candidate masks, or False if a box or a unit ran out of candidates.
+    """
+    ALL, bit_count = geometry.ALL, geometry.bit_count
+    unit_cells, peer_cells, cell_units = geometry.unit_cells, geometry.peer_cells, geometry.cell_units
+    # Only a deadline is worth a clock read per unit
+    timed = stats is not None and stats.deadline is not None
+    if changed is None:
+        changed = range(len(cells))
+    singles = [i for i in changed if bit_count[cells[i]] == 1]
+    dirty_units = set()
+    for i in changed:
+        dirty_units.update(cell_units[i])
+    while singles or dirty_units:
+        # Remove newly solved digits from the peers first, it is the cheaper rule
+        while singles:
+            i = singles.pop()
+            m = cells[i]
+            keep = ALL ^ m
+            for p in peer_cells[i]:
+                pm = cells[p]
+                if pm & m:
+                    pm &= keep
+                    if not pm:
+                        return False
+                    if trail is not None:
+                        trail.append((p, cells[p]))
+                    cells[p] = pm
+                    dirty_units.update(cell_units[p])
+                    if bit_count[pm] == 1:
+                        singles.append(p)
+        if dirty_units:
+            if stats is not None:
+                stats.rounds += 1
+                if timed:
+                    stats.check()
+            unit = unit_cells[dirty_units.pop()]
+            once = twice = 0
+            for i in unit:
+                m = cells[i]
+                twice |= once & m
+                once |= m
+            if once != ALL:
+                return False
+            only = once & ~twice
+            if only:
+                for i in unit:
+                    m = cells[i]
+                    hit = m & only
+                    if hit:
+                        # The only place for two digits, like only_choice()
+                        if hit & (hit - 1):
+                            return False
+                        if hit != m:
+                            if trail is not None:
+                                trail.append((i, m))
+                            cells[i] = hit
+                            singles.append(i)
+                            dirty_units.update(cell_units[i])
+    return cells
+
+
+# Propagation engines selectable in search()
+reducers = {'sweep': reduce_puzzle, 'queue': propagate}
+
+
+def undo(cells, trail, mark):
+    """Roll cells back to their state when the trail was mark entries long."""
+    while len(trail) > mark:
+        i, m = trail.pop()
+        cells[i] = m
+
+
+def branch_box(cells, geometry=standard):
+    """Return the index of an unfilled box with the fewest candidates, None if solved."""
+    bit_count = geometry.bit_count
+    n, s = geometry.n + 1, None
+    for i, m in enumerate(cells):
+        count = bit_count[m]
+        if 1 < count < n:
+            n, s = count, i
+            if n == 2:
+                break
+    return s
+
+
+def search(cells, reduce=reduce_puzzle, changed=None, geometry=standard, stats=None, depth=0):
+    """
+    Using depth-first search and propagation, try all possible values.
+    Args:
+        cells(list): candidate masks.
+        reduce: propagation function, reduce_puzzle or propagate.
+        changed: indices of the boxes changed since the last propagation, None for every box.
+        geometry(Geometry): the board layout.
+        stats(SearchStats): optional node and round counters, and budget.
+        depth(int): the depth of this node.
+    Returns:
+        The solved candidate masks or False if not solvable.
+    """
+    if stats is not None:
+        if depth == 0:
+            # Propagated in place, and only copies are branched on
+            stats.board = cells
+        stats.visit()
+    cells = reduce(cells, changed, geometry=geometry, stats=stats)
+    if cells is False:
+        return False
+    # Choose one of the unfilled boxes with the fewest possibilities
+    s = branch_box(cells, geometry)
+    if s is None:
+        return cells  # Solved!
+    m = cells[s]
+    while m:
+        bit = m & -m
+        m ^= bit
+        new_cells = cells[:]
+        new_cells[s] = bit
+        attempt = search(new_cells, reduce, (s,), geometry, stats, depth + 1)
+        if attempt:
+            return attempt
+    return False
+
+
+def search_trail(cells, trail=None, changed=None, geometry=standard, stats=None, depth=0):
+    """
+    Depth-first search on a single board with queue propagation.
+
+    Instead of copying the board at every branch, each write is recorded on the
+    trail and undone when the branch fails, so memory grows with the search
+    depth rather than with the number of branches tried.
+    Args:
+        cells(list): candidate masks, updated in place.
+        trail(list): the undo trail, None to start a new one.
+        changed: indices of the boxes changed since the last propagation, None for every box.
+        geometry(Geometry): the board layout.
+        stats(SearchStats): optional node and round counters, and budget.
+        depth(int): the depth of this node.
+    Returns:
+        The solved candidate masks or False if not solvable. On failure the
+        board is left partially propagated; only the caller's trail can restore it.
+    """
+    if stats is not None:
+        if depth == 0:
+            stats.board = cells
+        stats.visit()
+    if trail is None:
+        trail = []
+    if propagate(cells, changed, trail, geometry, stats) is False:
+        return False
+    if stats is not None and depth == 0:
+        # The branches below write to the same board
+        stats.board = cells[:]
+    s = branch_box(cells, geometry)
+    if s is None:
+        return cells  # Solved!
+    m = cells[s]
+    while m:
+        bit = m & -m
+        m ^= bit
+        mark = len(trail)
+        trail.append((s, cells[s]))
+        cells[s] = bit
+        if search_trail(cells, trail, (s,), geometry, stats, depth + 1):
+            return cells
+        undo(cells, trail, mark)
+    return False
+
+
+def count_search(cells, limit=None, trail=None, changed=None, geometry=standard):
+    """
+    Count the solutions of a board with the trail search, stopping at limit.
+    Args:
+        cells(list): candidate masks, restored on return only up to the caller's trail.
+        limit(int): stop once this many solutions are found, None to count them all.
+        trail(list): the undo trail, None to start a new one.
+        changed: indices of the boxes changed since the last propagation, None for every box.
+        geometry(Geometry): the board layout.
+    Returns:
+        The number of solutions found, at most limit.
+    """
+    if trail is None:
+        trail = []
+    if propagate(cells, changed, trail, geometry) is False:
+        return 0
+    s = branch_box(cells, geometry)
+    if s is None:
+        return 1
+    found = 0
+    m = cells[s]
+    while m and (limit is None or found < limit):
+        bit = m & -m
+        m ^= bit
+        mark = len(trail)
+        trail.append((s, cells[s]))
+        cells[s] = bit
+        found += count_search(cells, None if limit is None else limit - found, trail, (s,), geometry)
+        undo(cells, trail, mark)
+    return found
+
+
+def iter_search(cells, changed=None, geometry=standard):
+    """
+    Generate the solutions of a board with the trail search, one at a time.
+
+    The search keeps an explicit stack of the branches still to try, one entry
+    per branching box on the current path, and a single board restored from
+    the undo trail, so memory is bounded by the search depth however many
+    solutions there are.
+    Args:
+        cells(list): candidate masks, updated in place.
+        changed: indices of the boxes changed since the last propagation, None for every box.
+        geometry(Geometry): the board layout.
+    Returns:
+        A generator of solved boards. Each one is cells itself, which the
+        search keeps updating: copy or convert it before asking for the next.
+    """
+    trail = []
+    # (box, digits left to try, trail length before the box was set)
+    stack = []
+    consistent = propagate(cells, changed, trail, geometry) is not False
+    while True:
+        if consistent:
+            s = branch_box(cells, geometry)
+            if s is None:
+                yield cells
+            else:
+                stack.append((s, cells[s], len(trail)))
+        # Move on to the next untried branch
+        while stack:
+            s, m, mark = stack.pop()
+            undo(cells, trail, mark)
+            if m:
+                bit = m & -m
+                stack.append((s, m ^ bit, mark))
+                trail.append((s, cells[s]))
+                cells[s] = bit
+                consistent = propagate(cells, (s,), trail, geometry) is not False
+                break
+        else:
+            return
+
+
+def iter_solutions(grid, limit=None):
+    """
+    Generate the solutions of a Sudoku grid lazily, see iter_search().
+    Args:
+        grid(string): a string representing a sudoku grid.
+        limit(int): stop after this many solutions, None for all of them.
+    Returns:
+        A generator of solved 81 character grid strings.
+    """
+    solutions = iter_search(grid_masks(grid))
+    if limit is not None:
+        solutions = itertools.islice(solutions, limit)
+    for cells in solutions:
+        yield to_grid(cells)
+
+
+def count_solutions(grid, limit=2):
+    """
+    Count the solutions of a Sudoku grid, stopping as soon as limit are found.
+    With the default limit, 0 means unsolvable, 1 unique and 2 ambiguous.
+    """
+    return count_search(grid_masks(grid), limit)
+
+
+# Search modes selectable in solve()
+propagations = ('sweep', 'queue', 'trail')
+
+
+def solve_cells(cells, propagation='sweep', geometry=standard, stats=None):
+    """
+    Solve a board of candidate masks.
+    Args:
+        cells(list): candidate masks.
+        propagation(string): 'sweep' for reduce_puzzle, 'queue' for propagate
+            and 'trail' for propagate without board copies (search_trail).
+        geometry(Geometry): the board layout.
+        stats(SearchStats): optional node and round counters, and budget.
+    Returns:
+        The solved candidate masks or False if not solvable.
+    """
+    if propagation == 'trail':
+        return search_trail(cells, geometry=geometry, stats=stats)
+    return search(cells, reducers[propagation], geometry=geometry, stats=stats)
+
+
+def solve(grid, propagation='sweep', geometry=standard):
+    """
+    Find the solution to a Sudoku grid with the bitmask engine.
+    Args:
+        grid(string): a string representing a sudoku grid, see Geometry.grid_masks
+            for boards other than 9x9.
+        propagation(string): one of `propagations`, see solve_cells().
+        geometry(Geometry): the board layout.
+    Returns:
+        The dictionary representation of the final sudoku grid. False if no solution exists.
+    """
+    cells = grid_masks(grid) if geometry is standard else geometry.grid_masks(grid)
+    solved = solve_cells(cells, propagation, geometry)
+    if not solved:
+        return False
+    return to_values(solved) if geometry is standard else geometry.to_values(solved)
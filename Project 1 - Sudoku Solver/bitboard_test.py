@@ -0,0 +1,76 @@
+import bitboard
+import solution
+import testdata
+import unittest
+
+
+class TestBitboard(unittest.TestCase):
+    diagonal_grid = testdata.diagonal_grid
+
+    def test_tables(self):
+        self.assertEqual(len(bitboard.unit_cells), 29)
+        self.assertTrue(all(len(peers) in (20, 26, 32) for peers in bitboard.peer_cells))
+        self.assertEqual(bitboard.mask_digits[bitboard.ALL], '123456789')
+
+    def test_grid_masks(self):
+        cells = bitboard.grid_masks(self.diagonal_grid)
+        self.assertEqual(cells[0], bitboard.digit_mask['2'])
+        self.assertEqual(cells[1], bitboard.ALL)
+        self.assertEqual(bitboard.to_values(cells), solution.grid_values(self.diagonal_grid))
+
+    def test_solve_matches_dict_engine(self):
+        self.assertEqual(solution.solve(self.diagonal_grid, engine='bits'),
+                         solution.solve(self.diagonal_grid))
+
+    def test_queue_matches_sweep(self):
+        for grid in (self.diagonal_grid, '.' * 81, testdata.hard_grid):
+            self.assertEqual(bitboard.solve(grid, 'queue'), bitboard.solve(grid, 'sweep'))
+        self.assertEqual(solution.solve(self.diagonal_grid, engine='queue'),
+                         solution.solve(self.diagonal_grid))
+
+    def test_trail_search_restores_board(self):
+        grid = testdata.hard_grid
+        self.assertEqual(bitboard.solve(grid, 'trail'), bitboard.solve(grid, 'sweep'))
+        cells = bitboard.propagate(bitboard.grid_masks(grid))
+        before = cells[:]
+        trail = []
+        s = bitboard.branch_box(cells)
+        trail.append((s, cells[s]))
+        cells[s] &= -cells[s]
+        bitboard.propagate(cells, (s,), trail)
+        self.assertNotEqual(cells, before)
+        bitboard.undo(cells, trail, 0)
+        self.assertEqual(cells, before)
+
+    def test_propagate_from_changed_boxes(self):
+        cells = bitboard.propagate(bitboard.grid_masks(self.diagonal_grid))
+        reduced = bitboard.reduce_puzzle(bitboard.grid_masks(self.diagonal_grid))
+        self.assertEqual(cells, reduced)
+        self.assertFalse(bitboard.propagate(bitboard.grid_masks('11' + '.' * 79)))
+
+    def test_box_only_place_for_two_digits(self):
+        # A1 holds 1 or 2, and the rest of row A neither
+        cells = [bitboard.ALL] * 81
+        cells[0] = 0b11
+        for i in range(1, 9):
+            cells[i] = bitboard.ALL & ~0b11
+        self.assertFalse(bitboard.only_choice(cells[:]))
+        self.assertFalse(bitboard.reduce_puzzle(cells[:]))
+        self.assertFalse(bitboard.propagate(cells[:]))
+
+    def test_deadline_stops_propagation(self):
+        cells = bitboard.grid_masks(self.diagonal_grid)
+        solved = bitboard.solve_cells(cells[:], 'trail')
+        stats = bitboard.SearchStats(deadline_ms=0)
+        self.assertRaises(bitboard.BudgetExhausted, bitboard.propagate, cells, stats=stats)
+        # The givens were removed from their peers before the first unit scan
+        self.assertNotEqual(cells, bitboard.grid_masks(self.diagonal_grid))
+        self.assertTrue(all(m & s for m, s in zip(cells, solved)))
+
+    def test_unsolvable(self):
+        # Two 1s in the first row
+        self.assertFalse(bitboard.solve('11' + '.' * 79))
+
+
+if __name__ == '__main__':
+    unittest.main()
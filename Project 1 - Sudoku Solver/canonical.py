@@ -0,0 +1,204 @@
+"""
+Canonical forms of diagonal sudokus and a solution cache keyed on them.
+
+Two puzzles are equivalent when one turns into the other by relabeling the
+digits and moving the boxes with a symmetry of the board. Permuting the rows
+of a band alone would break the diagonal units, so the symmetries of the
+diagonal sudoku are those of the square (rotations, transposition and the
+other reflections) combined with the row permutations p applied to the
+columns as well that keep the bands and commute with reversal: swapping the
+outer bands, mirrored swaps of rows inside the outer bands, and swapping the
+outer rows of the middle band. They make a group of 96 box permutations.
+
+The canonical form of a puzzle is the smallest, as a byte string, of its
+images under every symmetry with the digits renumbered in order of first
+appearance. A SolutionCache maps canonical forms to canonical solutions, so
+a puzzle equivalent to one solved before gets its solution by mapping the
+cached one back instead of searching. Puzzles seen before exactly as given
+are also keyed as they are, which skips the canonical form altogether.
+"""
+
+import dbm
+import operator
+from collections import OrderedDict
+
+import bitboard
+import packed
+
+SIZE = 9
+DIGITS = bytes(range(1, SIZE + 1))
+
+
+def position_map(f):
+    """Return the box permutation moving box (r, c) of the image from box f(r, c) of the puzzle."""
+    return tuple(a * SIZE + b for a, b in (f(r, c) for r in range(SIZE) for c in range(SIZE)))
+
+
+def line_map(p):
+    """Return the box permutation applying the line permutation p to both rows and columns."""
+    return position_map(lambda r, c: (p[r], p[c]))
+
+
+generators = (
+    position_map(lambda r, c: (c, r)),                # transposition
+    position_map(lambda r, c: (SIZE - 1 - c, r)),     # quarter turn
+    line_map((6, 7, 8, 3, 4, 5, 0, 1, 2)),            # swap the outer bands
+    line_map((1, 0, 2, 3, 4, 5, 6, 8, 7)),            # mirrored swaps in the outer bands
+    line_map((0, 2, 1, 3, 4, 5, 7, 6, 8)),
+    line_map((0, 1, 2, 5, 4, 3, 6, 7, 8)),            # swap the outer rows of the middle band
+)
+
+
+def build_symmetries():
+    """Return the group generated by `generators`, the identity first."""
+    identity = tuple(range(SIZE * SIZE))
+    group = [identity]
+    found = set(group)
+    for a in group:
+        for g in generators:
+            composed = tuple(a[i] for i in g)
+            if composed not in found:
+                found.add(composed)
+                group.append(composed)
+    return group
+
+
+symmetries = build_symmetries()
+# Gathering the boxes of an image is one C call per symmetry
+gatherers = [operator.itemgetter(*s) for s in symmetries]
+
+
+def relabel_table(image):
+    """
+    Return the translation table renumbering the digits of image in order of first appearance.
+    Digits missing from the image get the remaining numbers in increasing order.
+    """
+    order = bytes(dict.fromkeys(image)).replace(b'\0', b'')
+    return bytes.maketrans(order + DIGITS.translate(None, order), DIGITS)
+
+
+def canonical_form(digits):
+    """
+    Find the canonical form of a puzzle.
+    Args:
+        digits: 81 box bytes, see packed.py.
+    Returns:
+        A (form, symmetry, table) tuple: the canonical box bytes, the box
+        permutation and the digit translation table that turn digits into them.
+    """
+    best = None
+    for symmetry, gather in zip(symmetries, gatherers):
+        image = bytes(gather(digits))
+        table = relabel_table(image)
+        form = image.translate(table)
+        if best is None or form < best[0]:
+            best = (form, symmetry, table)
+    return best
+
+
+def restore(form, symmetry, table):
+    """Undo canonical_form(): map box bytes in canonical form back onto the original puzzle."""
+    inverse = bytearray(256)
+    for d in range(256):
+        inverse[table[d]] = d
+    digits = bytearray(len(form))
+    for i, d in zip(symmetry, form.translate(bytes(inverse))):
+        digits[i] = d
+    return bytes(digits)
+
+
+class SolutionCache:
+    """
+    A bounded LRU cache from canonical puzzles to canonical solutions.
+
+    It holds up to maxsize canonical forms. A separate LRU of the same size
+    holds solved puzzles as given, with their solution as is, so a puzzle seen
+    before exactly skips the canonical form; it costs no room among the
+    canonical forms. With a path, canonical forms also go to a dbm database
+    there, which outlives the process and is looked up when the memory cache
+    misses; puzzles as given stay in memory, a new process finds them again
+    through their canonical form. Unsolvable puzzles are cached too. `hits`
+    and `misses` count the lookups.
+    """
+
+    # Stored for puzzles without a solution
+    UNSOLVABLE = b''
+
+    def __init__(self, maxsize=1024, path=None):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        # Puzzles as given, to their solutions
+        self.exact = OrderedDict()
+        self.db = dbm.open(path, 'c') if path else None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        """Return the number of canonical forms in memory."""
+        return len(self.entries)
+
+    def lookup(self, form):
+        """Return the cached solution of a canonical form, or None."""
+        if form in self.entries:
+            self.entries.move_to_end(form)
+            return self.entries[form]
+        if self.db is not None and form in self.db:
+            solution = self.db[form]
+            self.remember(form, solution)
+            return solution
+        return None
+
+    def remember(self, form, solution, entries=None):
+        """Add a key to an LRU, the canonical forms by default, evicting its oldest key when full."""
+        if entries is None:
+            entries = self.entries
+        entries[form] = solution
+        entries.move_to_end(form)
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+
+    def store(self, form, solution):
+        """Cache the canonical solution of a canonical form."""
+        self.remember(form, solution)
+        if self.db is not None:
+            self.db[form] = solution
+
+    def solve(self, grid, solver):
+        """
+        Solve a grid through the cache.
+        Args:
+            grid(string): a string representing a sudoku grid.
+            solver: function solving a grid, returning the dictionary form of
+                solution.py or False; only called on a cache miss, with the
+                canonical puzzle.
+        Returns:
+            The dictionary representation of the final sudoku grid. False if no solution exists.
+        """
+        digits = packed.parse(grid)
+        if digits is None:
+            raise ValueError('Not a sudoku grid: {!r}'.format(grid))
+        solution = self.exact.get(digits)
+        if solution is not None:
+            self.exact.move_to_end(digits)
+            self.hits += 1
+        else:
+            form, symmetry, table = canonical_form(digits)
+            solution = self.lookup(form)
+            if solution is None:
+                self.misses += 1
+                solved = solver(packed.to_grid(form))
+                solution = packed.parse(''.join(solved[box] for box in bitboard.boxes)) if solved else self.UNSOLVABLE
+                self.store(form, solution)
+            else:
+                self.hits += 1
+            if solution != self.UNSOLVABLE:
+                solution = restore(solution, symmetry, table)
+            self.remember(digits, solution, self.exact)
+        if solution == self.UNSOLVABLE:
+            return False
+        return bitboard.to_values(packed.to_cells(solution))
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
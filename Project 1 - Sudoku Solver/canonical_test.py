@@ -0,0 +1,83 @@
+import canonical
+import os
+import packed
+import random
+import shutil
+import solution
+import tempfile
+import testdata
+import unittest
+
+
+class TestCanonical(unittest.TestCase):
+    diagonal_grid = testdata.diagonal_grid
+
+    def equivalents(self, grid, count, seed=0):
+        """Return random relabeled symmetric images of a grid."""
+        rng = random.Random(seed)
+        digits = packed.parse(grid)
+        images = []
+        for _ in range(count):
+            symmetry = rng.choice(canonical.symmetries)
+            labels = list(range(1, 10))
+            rng.shuffle(labels)
+            table = bytes([0] + labels) + bytes(246)
+            images.append(packed.to_grid(bytes(digits[i] for i in symmetry).translate(table)))
+        return images
+
+    def test_symmetries_keep_the_units(self):
+        self.assertEqual(len(canonical.symmetries), 96)
+        units = set(frozenset(solution.boxes.index(box) for box in unit) for unit in solution.unitlist)
+        for symmetry in canonical.symmetries:
+            self.assertEqual(set(frozenset(symmetry[i] for i in unit) for unit in units), units)
+
+    def test_equivalent_puzzles_share_the_form(self):
+        form = canonical.canonical_form(packed.parse(self.diagonal_grid))[0]
+        for grid in self.equivalents(self.diagonal_grid, 20):
+            form_of_grid, symmetry, table = canonical.canonical_form(packed.parse(grid))
+            self.assertEqual(form_of_grid, form)
+            self.assertEqual(canonical.restore(form, symmetry, table), packed.parse(grid))
+
+    def test_cache_maps_solutions_back(self):
+        cache = canonical.SolutionCache()
+        for grid in [self.diagonal_grid] + self.equivalents(self.diagonal_grid, 10):
+            self.assertEqual(solution.solve(grid, cache=cache), solution.solve(grid, engine='dlx'))
+        self.assertEqual((cache.hits, cache.misses), (10, 1))
+        self.assertFalse(solution.solve('11' + '.' * 79, cache=cache))
+        self.assertFalse(solution.solve('11' + '.' * 79, cache=cache))
+        self.assertEqual(cache.misses, 2)
+        self.assertRaises(ValueError, cache.solve, 'bad', solution.solve)
+
+    def test_puzzles_as_given_take_no_canonical_slot(self):
+        cache = canonical.SolutionCache(maxsize=2)
+        for grid in (self.diagonal_grid, testdata.unique_grid):
+            solution.solve(grid, cache=cache)
+        self.assertEqual((len(cache), len(cache.exact)), (2, 2))
+        # Both canonical forms are still cached
+        for grid in (self.diagonal_grid, testdata.unique_grid):
+            image = self.equivalents(grid, 1, seed=2)[0]
+            self.assertEqual(solution.solve(image, cache=cache), solution.solve(image, engine='dlx'))
+        self.assertEqual((cache.hits, cache.misses), (2, 2))
+        self.assertEqual(len(cache.exact), 2)
+
+    def test_lru_bound_and_disk(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'solutions')
+            cache = canonical.SolutionCache(maxsize=2, path=path)
+            solution.solve(self.diagonal_grid, cache=cache)
+            solution.solve('11' + '.' * 79, cache=cache)
+            self.assertEqual(len(cache), 2)
+            cache.close()
+            # A new process finds the solutions on disk
+            cache = canonical.SolutionCache(maxsize=2, path=path)
+            grid = self.equivalents(self.diagonal_grid, 1, seed=1)[0]
+            self.assertEqual(solution.solve(grid, cache=cache), solution.solve(grid, engine='dlx'))
+            self.assertEqual((cache.hits, cache.misses), (1, 0))
+            cache.close()
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
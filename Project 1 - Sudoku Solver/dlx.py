@@ -0,0 +1,255 @@
+"""
+Dancing Links (Knuth's Algorithm X) exact cover engine for the diagonal sudoku.
+
+The sudoku is encoded as an exact cover problem with one column per box
+(every box holds exactly one digit) and one column per unit and digit (every
+unit of `unitlist` holds every digit exactly once). Row 9 * box + d places
+digit d + 1 in box and covers the box column plus the unit columns of every
+unit the box belongs to.
+
+The links of the full matrix are built once when the module is imported; each
+puzzle works on a copy, covers the columns of its givens and searches the rest.
+"""
+
+from utils import boxes, unitlist
+import bitboard
+
+digits = '123456789'
+
+box_columns = len(boxes)
+columns = box_columns + len(unitlist) * len(digits)
+
+
+def row_columns(box, d):
+    """Return the columns covered by placing digit index d in box index box."""
+    return [box] + [box_columns + u * len(digits) + d for u in bitboard.cell_units[box]]
+
+
+def build_links():
+    """
+    Build the circular doubly linked matrix of every (box, digit) row.
+    Returns:
+        A tuple (L, R, U, D, C, S, row_of, row_start) of lists. Node 0 is the
+        root, nodes 1..columns the column headers, then the nodes of each row.
+    """
+    count = columns + 1
+    L = [i - 1 for i in range(count)]
+    R = [i + 1 for i in range(count)]
+    L[0], R[-1] = count - 1, 0
+    U = list(range(count))
+    D = list(range(count))
+    C = list(range(count))
+    S = [0] * count
+    row_of = [-1] * count
+    row_start = []
+    for box in range(len(boxes)):
+        for d in range(len(digits)):
+            row = box * len(digits) + d
+            first = len(C)
+            row_start.append(first)
+            cols = row_columns(box, d)
+            for k, col in enumerate(cols):
+                node = len(C)
+                header = col + 1
+                # Link horizontally into the row
+                L.append(first + (k - 1) % len(cols))
+                R.append(first + (k + 1) % len(cols))
+                # Link vertically at the bottom of the column
+                U.append(U[header])
+                D.append(header)
+                D[U[header]] = node
+                U[header] = node
+                C.append(header)
+                row_of.append(row)
+                S[header] += 1
+    return L, R, U, D, C, S, row_of, row_start
+
+
+links = build_links()
+
+
+class DancingLinks:
+    """A copy of the sudoku exact cover matrix for one puzzle."""
+
+    def __init__(self):
+        L, R, U, D, C, S, row_of, row_start = links
+        self.L, self.R, self.U, self.D = L[:], R[:], U[:], D[:]
+        self.S = S[:]
+        self.C = C
+        self.row_of = row_of
+        self.row_start = row_start
+        self.covered = set()
+        # Calls of search(), the nodes of the search tree
+        self.nodes = 0
+        # Exact covers found by search()
+        self.found = 0
+
+    def cover(self, c):
+        """Remove column header c and every row intersecting it."""
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        L[R[c]] = L[c]
+        R[L[c]] = R[c]
+        i = D[c]
+        while i != c:
+            j = R[i]
+            while j != i:
+                U[D[j]] = U[j]
+                D[U[j]] = D[j]
+                S[C[j]] -= 1
+                j = R[j]
+            i = D[i]
+
+    def uncover(self, c):
+        """Undo cover(c)."""
+        L, R, U, D, C, S = self.L, self.R, self.U, self.D, self.C, self.S
+        i = U[c]
+        while i != c:
+            j = L[i]
+            while j != i:
+                S[C[j]] += 1
+                U[D[j]] = j
+                D[U[j]] = j
+                j = L[j]
+            i = U[i]
+        L[R[c]] = c
+        R[L[c]] = c
+
+    def select(self, row):
+        """
+        Commit to a row before searching, as for a given of the puzzle.
+        Returns:
+            False if the row clashes with an earlier selection.
+        """
+        first = self.row_start[row]
+        nodes = [first]
+        j = self.R[first]
+        while j != first:
+            nodes.append(j)
+            j = self.R[j]
+        headers = [self.C[n] for n in nodes]
+        if self.covered.intersection(headers):
+            return False
+        for c in headers:
+            self.covered.add(c)
+            self.cover(c)
+        return True
+
+    def search(self, chosen, solutions, limit):
+        """
+        Find exact covers of the remaining columns, counting them in found.
+        Args:
+            chosen(list): the rows selected so far by the search.
+            solutions(list): solutions found, each a list of rows, None to
+                only count them.
+            limit(int): stop once found reaches this many solutions, None for all.
+        Returns:
+            True if the limit was reached.
+        """
+        R, D, C, S = self.R, self.D, self.C, self.S
+        self.nodes += 1
+        if R[0] == 0:
+            self.found += 1
+            if solutions is not None:
+                solutions.append(chosen[:])
+            return limit is not None and self.found >= limit
+        # Choose the column with the fewest rows left
+        c = R[0]
+        best = S[c]
+        j = R[c]
+        while j != 0 and best > 1:
+            if S[j] < best:
+                c, best = j, S[j]
+            j = R[j]
+        if best == 0:
+            return False
+        self.cover(c)
+        r = D[c]
+        done = False
+        while r != c and not done:
+            chosen.append(self.row_of[r])
+            j = R[r]
+            while j != r:
+                self.cover(C[j])
+                j = R[j]
+            done = self.search(chosen, solutions, limit)
+            j = self.L[r]
+            while j != r:
+                self.uncover(C[j])
+                j = self.L[j]
+            chosen.pop()
+            r = D[r]
+        self.uncover(c)
+        return done
+
+
+def load(grid):
+    """
+    Return a matrix with the givens of a grid selected, and the list of their
+    rows, or None if two givens clash.
+    """
+    matrix = DancingLinks()
+    givens = []
+    for box, m in enumerate(bitboard.grid_masks(grid)):
+        if bitboard.bit_count[m] == 1:
+            row = box * len(digits) + m.bit_length() - 1
+            if not matrix.select(row):
+                return None
+            givens.append(row)
+    return matrix, givens
+
+
+def solve_rows(grid, limit=1, stats=None):
+    """
+    Find up to limit solutions of a grid.
+    Args:
+        grid(string): a string representing a sudoku grid.
+        limit(int): maximum number of solutions, None for all of them.
+        stats(SearchStats): if given, counts the search nodes.
+    Returns:
+        A list of solutions, each a list of 81 rows (9 * box + digit index).
+    """
+    loaded = load(grid)
+    if loaded is None:
+        return []
+    matrix, givens = loaded
+    solutions = []
+    matrix.search(givens, solutions, limit)
+    if stats is not None:
+        stats.nodes += matrix.nodes
+    return solutions
+
+
+def rows_to_values(rows):
+    """Convert a solution given as rows into the dictionary form of solution.py."""
+    values = {}
+    for row in rows:
+        box, d = divmod(row, len(digits))
+        values[boxes[box]] = digits[d]
+    return values
+
+
+def count_solutions(grid, limit=None):
+    """
+    Return the number of solutions of a grid, counting at most limit of them.
+    The solutions are counted, not kept, so memory does not grow with them.
+    """
+    loaded = load(grid)
+    if loaded is None:
+        return 0
+    matrix, givens = loaded
+    matrix.search(givens, None, limit)
+    return matrix.found
+
+
+def solve(grid):
+    """
+    Find the solution to a Sudoku grid with dancing links.
+    Args:
+        grid(string): a string representing a sudoku grid.
+    Returns:
+        The dictionary representation of the final sudoku grid. False if no solution exists.
+    """
+    solutions = solve_rows(grid, 1)
+    if solutions:
+        return rows_to_values(solutions[0])
+    return False
@@ -0,0 +1,44 @@
+import dlx
+import solution
+import testdata
+import unittest
+
+
+def is_valid_solution(values):
+    return all(sorted(values[box] for box in unit) == list('123456789') for unit in solution.unitlist)
+
+
+class TestDancingLinks(unittest.TestCase):
+    diagonal_grid = testdata.diagonal_grid
+
+    def test_columns(self):
+        # 81 boxes plus 9 digits for each of the 27 standard and 2 diagonal units
+        self.assertEqual(dlx.columns, 81 + 29 * 9)
+        self.assertEqual(len(dlx.links[-1]), 729)
+
+    def test_solve_matches_dict_engine(self):
+        self.assertEqual(solution.solve(self.diagonal_grid, engine='dlx'),
+                         solution.solve(self.diagonal_grid))
+
+    def test_empty_grid(self):
+        self.assertTrue(is_valid_solution(dlx.solve('.' * 81)))
+
+    def test_count_solutions(self):
+        self.assertEqual(dlx.count_solutions(self.diagonal_grid), 1)
+        self.assertEqual(dlx.count_solutions('.' * 81, limit=10), 10)
+        self.assertEqual(dlx.count_solutions('11' + '.' * 79), 0)
+
+    def test_counting_keeps_no_solution(self):
+        matrix = dlx.DancingLinks()
+        self.assertTrue(matrix.search([], None, 50))
+        self.assertEqual(matrix.found, 50)
+
+    def test_matrix_restored_after_search(self):
+        matrix = dlx.DancingLinks()
+        before = (matrix.L[:], matrix.R[:], matrix.U[:], matrix.D[:], matrix.S[:])
+        matrix.search([], [], 3)
+        self.assertEqual((matrix.L, matrix.R, matrix.U, matrix.D, matrix.S), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,183 @@
+"""
+Generate diagonal sudokus with a unique solution at a target difficulty.
+
+A puzzle starts from a random solved board: a few random givens are solved
+with the bitmask engine. Clues are then removed in random order as long as
+the puzzle keeps a single solution, counting solutions with an early cutoff
+at two. The difficulty is the smallest level of strategies of solution.py
+that solves the puzzle by propagation alone, 'expert' if it needs search.
+Minimal puzzles mostly need search, so a puzzle harder than the target gets
+clues of its solution back, in random order, skipping the clues that would
+make it easier than the target; attempts that miss the target start over
+from a new board.
+
+Puzzle i of a run with seed s is made from its own random generator seeded
+with 's:i', so runs are reproducible whatever the number of processes.
+
+Usage:
+    python generator.py --count 100 --difficulty hard --workers 4 > puzzles.txt
+"""
+
+import argparse
+import functools
+import multiprocessing
+import random
+import sys
+from timeit import default_timer as timer
+
+import bitboard
+import packed
+import solution
+
+# Difficulty levels, each solved by propagation with its strategies and those before it
+levels = (
+    ('easy', ('eliminate', 'only_choice')),
+    ('medium', ('naked_twins',)),
+    ('hard', ('hidden_pairs', 'pointing_pairs', 'naked_triples', 'x_wing')),
+)
+EXPERT = 'expert'
+difficulties = tuple(name for name, _ in levels) + (EXPERT,)
+
+# Random givens of a new solved board
+SEED_GIVENS = 11
+
+
+def random_solution(rng):
+    """Return the candidate masks of a random solved board."""
+    while True:
+        cells = [bitboard.ALL] * len(bitboard.boxes)
+        for i in rng.sample(range(len(cells)), SEED_GIVENS):
+            cells[i] = 1 << rng.randrange(len(bitboard.digits))
+        solved = bitboard.solve_cells(cells, 'trail')
+        if solved:
+            return solved
+
+
+def is_unique(cells):
+    """Return True if a board has exactly one solution."""
+    return bitboard.count_search(cells[:], 2) == 1
+
+
+def remove_clues(solved, rng):
+    """
+    Clear the boxes of a solved board in random order while the solution stays unique.
+    Returns:
+        The candidate masks of the puzzle.
+    """
+    cells = solved[:]
+    for i in rng.sample(range(len(cells)), len(cells)):
+        cells[i] = bitboard.ALL
+        if not is_unique(cells):
+            cells[i] = solved[i]
+    return cells
+
+
+def rate(grid):
+    """
+    Rate a puzzle by the strategies it needs.
+    Args:
+        grid(string): a string representing a sudoku grid.
+    Returns:
+        One of `difficulties`.
+    """
+    strategies = []
+    for name, added in levels:
+        strategies.extend(added)
+        values = solution.reduce_puzzle(solution.grid_values(grid), strategies=solution.make_strategies(strategies))
+        if values and solution.is_solved(values):
+            return name
+    return EXPERT
+
+
+def make_puzzle(index, seed=0, difficulty='hard', attempts=50):
+    """
+    Make puzzle number index of a run.
+    Args:
+        index(int): the number of the puzzle in the run.
+        seed(int): the seed of the run.
+        difficulty(string): one of `difficulties`.
+        attempts(int): solved boards to try before giving up.
+    Returns:
+        The puzzle grid, or None if no attempt reached the difficulty.
+    """
+    rng = random.Random('{}:{}'.format(seed, index))
+    target = difficulties.index(difficulty)
+    for _ in range(attempts):
+        solved = random_solution(rng)
+        cells = remove_clues(solved, rng)
+        grid = bitboard.to_grid(cells)
+        level = difficulties.index(rate(grid))
+        if level < target:
+            continue
+        # Give clues back until the puzzle is no harder than the target
+        empty = [i for i, m in enumerate(cells) if m == bitboard.ALL]
+        rng.shuffle(empty)
+        while level > target and empty:
+            i = empty.pop()
+            cells[i] = solved[i]
+            easier = difficulties.index(rate(bitboard.to_grid(cells)))
+            if easier < target:
+                cells[i] = bitboard.ALL
+            else:
+                level = easier
+        if level == target:
+            return bitboard.to_grid(cells)
+    return None
+
+
+def generate(count, difficulty='hard', seed=0, workers=1, chunksize=4):
+    """
+    Generate puzzles lazily.
+    Args:
+        count(int): number of puzzles.
+        difficulty(string): one of `difficulties`.
+        seed(int): the seed of the run.
+        workers(int): number of processes, 1 generates in this process.
+        chunksize(int): puzzles sent to a worker at a time.
+    Returns:
+        A generator of puzzle grids, or None for the puzzles that missed the
+        difficulty, in the same order for any number of workers.
+    """
+    maker = functools.partial(make_puzzle, seed=seed, difficulty=difficulty)
+    if workers == 1:
+        for index in range(count):
+            yield maker(index)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        for grid in pool.imap(maker, range(count), chunksize):
+            yield grid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate unique diagonal sudokus.")
+    parser.add_argument('-n', '--count', type=int, default=10, help="number of puzzles (default 10)")
+    parser.add_argument('-d', '--difficulty', choices=difficulties, default='hard',
+                        help="difficulty of the puzzles (default hard)")
+    parser.add_argument('-s', '--seed', type=int, default=0, help="seed of the run (default 0)")
+    parser.add_argument('-w', '--workers', type=int, default=1,
+                        help="worker processes, 0 for one per core (default 1)")
+    parser.add_argument('-o', '--output', help="puzzle file, defaults to text lines on stdout")
+    parser.add_argument('-f', '--format', choices=packed.formats, default='text',
+                        help="output format, text lines or binary records (default text)")
+    args = parser.parse_args(argv)
+    if args.format != 'text' and not args.output:
+        parser.error('binary records must be written to a file')
+
+    start = timer()
+    grids = [grid for grid in generate(args.count, args.difficulty, args.seed,
+                                       args.workers or multiprocessing.cpu_count()) if grid]
+    elapsed = timer() - start
+    if args.format != 'text':
+        packed.write_records(args.output, map(packed.parse, grids), packed.record_sizes[args.format])
+    else:
+        out = open(args.output, 'w') if args.output else sys.stdout
+        for grid in grids:
+            out.write(grid + '\n')
+        if args.output:
+            out.close()
+    sys.stderr.write('{} {} puzzles of {} in {:.2f}s: {:.1f} puzzles/s\n'.format(
+        len(grids), args.difficulty, args.count, elapsed, len(grids) / elapsed if elapsed > 0 else float('inf')))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+import bitboard
+import generator
+import testdata
+import unittest
+
+
+class TestGenerator(unittest.TestCase):
+    diagonal_grid = testdata.diagonal_grid
+    unique_grid = testdata.unique_grid
+
+    def test_rate(self):
+        self.assertEqual(generator.rate(self.diagonal_grid), 'easy')
+        # A 17 clue puzzle propagation alone cannot finish
+        self.assertEqual(generator.rate(self.unique_grid), 'expert')
+
+    def test_puzzles_are_unique_at_the_difficulty(self):
+        for difficulty in ('easy', 'expert'):
+            grid = generator.make_puzzle(0, seed=1, difficulty=difficulty)
+            self.assertEqual(bitboard.count_solutions(grid), 1)
+            self.assertEqual(generator.rate(grid), difficulty)
+
+    def test_seeding_is_independent_of_workers(self):
+        serial = list(generator.generate(2, 'easy', seed=2))
+        self.assertEqual(list(generator.generate(2, 'easy', seed=2, workers=2, chunksize=1)), serial)
+        self.assertEqual(len(set(serial)), 2)
+        self.assertNotEqual(list(generator.generate(2, 'easy', seed=3)), serial)
+
+
+if __name__ == '__main__':
+    unittest.main()
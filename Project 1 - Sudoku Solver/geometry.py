@@ -0,0 +1,133 @@
+"""
+Board geometry for sudokus of any square size.
+
+A Geometry builds the boxes, units and peers of a board made of size x size
+squares, so size 3 gives the usual 9x9 board, size 4 a 16x16 board and size 5
+a 25x25 board, optionally with the two diagonal units. Besides the box-name
+tables used by the dictionary solver it holds the same tables as indices into
+a flat board of candidate masks, for the bitmask engine of bitboard.py.
+
+Boards with more than nine symbols are read and written as whitespace
+separated tokens, e.g. '16 . 3 . 12 ...'.
+"""
+
+import string
+
+
+def cross(A, B):
+    "Cross product of elements in A and elements in B."
+    return [s+t for s in A for t in B]
+
+
+def default_symbols(n):
+    """Return the symbols of a board with n symbols: '1'..'9', then '10', '11', ..."""
+    return tuple(str(i + 1) for i in range(n))
+
+
+class PopCount:
+    """Number of set bits of a mask, indexable like the lookup table of small boards."""
+
+    def __getitem__(self, m):
+        return bin(m).count('1')
+
+
+# Boards up to this many symbols get a lookup table for bit counts
+TABLE_SYMBOLS = 16
+
+# Characters accepted for an empty box
+EMPTY = ('.', '0', '_')
+
+
+class Geometry:
+    """Boxes, units and peers of a sudoku made of size x size squares."""
+
+    def __init__(self, size=3, diagonal=True, symbols=None):
+        n = size * size
+        if n > len(string.ascii_uppercase):
+            raise ValueError('Boards larger than 25x25 are not supported')
+        self.size = size
+        self.n = n
+        self.diagonal = diagonal
+        self.symbols = tuple(symbols or default_symbols(n))
+        if len(self.symbols) != n:
+            raise ValueError('A {0}x{0} board needs {0} symbols'.format(n))
+
+        # Box names, e.g. 'A1' .. 'I9' for size 3 and 'A1' .. 'P16' for size 4
+        self.rows = string.ascii_uppercase[:n]
+        self.cols = [str(c + 1) for c in range(n)]
+        self.boxes = cross(self.rows, self.cols)
+
+        row_units = [cross(r, self.cols) for r in self.rows]
+        column_units = [cross(self.rows, [c]) for c in self.cols]
+        row_bands = [self.rows[i:i + size] for i in range(0, n, size)]
+        col_bands = [self.cols[i:i + size] for i in range(0, n, size)]
+        square_units = [cross(rs, cs) for rs in row_bands for cs in col_bands]
+        self.unitlist = row_units + column_units + square_units
+        if diagonal:
+            self.unitlist += [[self.rows[i] + self.cols[i] for i in range(n)],
+                              [self.rows[::-1][i] + self.cols[i] for i in range(n)]]
+        self.units = dict((s, [u for u in self.unitlist if s in u]) for s in self.boxes)
+        self.peers = dict((s, set(sum(self.units[s], [])) - set([s])) for s in self.boxes)
+
+        # The same tables as indices into a flat board of candidate masks
+        self.ALL = (1 << n) - 1
+        self.box_index = dict((s, i) for i, s in enumerate(self.boxes))
+        self.unit_cells = tuple(tuple(self.box_index[s] for s in unit) for unit in self.unitlist)
+        self.peer_cells = tuple(tuple(sorted(self.box_index[p] for p in self.peers[s]))
+                                for s in self.boxes)
+        self.cell_units = tuple(tuple(u for u, unit in enumerate(self.unit_cells) if i in unit)
+                                for i in range(len(self.boxes)))
+        if n <= TABLE_SYMBOLS:
+            self.bit_count = tuple(bin(m).count('1') for m in range(self.ALL + 1))
+        else:
+            self.bit_count = PopCount()
+        self.symbol_mask = dict((d, 1 << k) for k, d in enumerate(self.symbols))
+
+    def mask_symbols(self, m):
+        """Return the symbols of a candidate mask, joined with spaces for multi-character symbols."""
+        separator = ' ' if self.n > 9 else ''
+        return separator.join(d for k, d in enumerate(self.symbols) if m >> k & 1)
+
+    def tokens(self, grid):
+        """Split a grid string into one token per box."""
+        tokens = grid.split()
+        if len(tokens) == len(self.boxes):
+            return tokens
+        # Single character symbols may be written without separators
+        return [c for c in grid if not c.isspace()]
+
+    def grid_masks(self, grid):
+        """
+        Convert a grid string into candidate masks, ALL for empties.
+        Args:
+            grid(string): one symbol or '.' per box, separated by whitespace
+                when the symbols have more than one character.
+        Returns:
+            A list of integers in `boxes` order.
+        Raises:
+            ValueError if a token is not a symbol or the box count is wrong.
+        """
+        cells = []
+        for token in self.tokens(grid):
+            if token in self.symbol_mask:
+                cells.append(self.symbol_mask[token])
+            elif token in EMPTY:
+                cells.append(self.ALL)
+            else:
+                raise ValueError('Unknown symbol: {}'.format(token))
+        if len(cells) != len(self.boxes):
+            raise ValueError('Expected {} boxes, got {}'.format(len(self.boxes), len(cells)))
+        return cells
+
+    def to_grid(self, cells):
+        """Convert candidate masks into a grid string, '.' for unsolved boxes."""
+        tokens = [self.mask_symbols(m) if self.bit_count[m] == 1 else '.' for m in cells]
+        return (' ' if self.n > 9 else '').join(tokens)
+
+    def to_values(self, cells):
+        """Convert candidate masks into the dictionary form of solution.py."""
+        return dict(zip(self.boxes, (self.mask_symbols(m) for m in cells)))
+
+
+# The diagonal 9x9 sudoku of this project
+standard = Geometry(3, diagonal=True)
@@ -0,0 +1,52 @@
+import bitboard
+import scaling
+import solution
+import unittest
+from geometry import Geometry, standard
+
+
+class TestGeometry(unittest.TestCase):
+
+    def test_standard_matches_solution_tables(self):
+        self.assertEqual(standard.boxes, solution.boxes)
+        self.assertEqual(standard.unitlist, solution.unitlist)
+        self.assertEqual(standard.peers, solution.peers)
+
+    def test_unit_and_peer_counts(self):
+        for size, diagonal, units, peers in ((3, False, 27, 20), (4, True, 50, 39), (5, False, 75, 64)):
+            geometry = Geometry(size, diagonal)
+            self.assertEqual(len(geometry.unitlist), units)
+            self.assertEqual(min(len(p) for p in geometry.peer_cells), peers)
+            self.assertTrue(all(len(u) == geometry.n for u in geometry.unit_cells))
+
+    def test_multi_character_symbols(self):
+        geometry = Geometry(4, diagonal=False)
+        grid = ' '.join(['16', '.', '10'] + ['.'] * 253)
+        cells = geometry.grid_masks(grid)
+        self.assertEqual(cells[0], 1 << 15)
+        self.assertEqual(cells[1], geometry.ALL)
+        self.assertEqual(geometry.to_grid(cells).split()[:3], ['16', '.', '10'])
+        self.assertRaises(ValueError, geometry.grid_masks, '17 ' + '. ' * 255)
+        self.assertRaises(ValueError, geometry.grid_masks, '. ' * 10)
+
+    def test_custom_single_character_symbols(self):
+        geometry = Geometry(4, diagonal=False, symbols='0123456789ABCDEF')
+        cells = geometry.grid_masks('0F' + '.' * 254)
+        self.assertEqual(cells[:2], [1, 1 << 15])
+
+    def test_solve_16x16(self):
+        geometry = Geometry(4, diagonal=True)
+        for cells in scaling.make_puzzles(geometry, 2):
+            solved = bitboard.solve_cells(cells[:], 'trail', geometry)
+            values = geometry.to_values(solved)
+            for unit in geometry.unitlist:
+                self.assertEqual(sorted(values[box] for box in unit), sorted(geometry.symbols))
+            for i, m in enumerate(cells):
+                if m != geometry.ALL:
+                    self.assertEqual(solved[i], m)
+        grid = geometry.to_grid(cells)
+        self.assertEqual(bitboard.solve(grid, 'queue', geometry), values)
+
+
+if __name__ == '__main__':
+    unittest.main()
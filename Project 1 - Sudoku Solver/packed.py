@@ -0,0 +1,228 @@
+"""
+Compact puzzle formats for bulk pipelines.
+
+A board is held as 81 bytes, one per box in `boxes` order, holding the digit
+of the box or 0 when it is empty. The same bytes are the 81 byte binary
+record of a puzzle or a solution; the 41 byte record packs two boxes per
+byte, high nibble first, the low nibble of the last byte being 0.
+
+Text grids are parsed with one bytes.translate() call instead of a loop per
+character, and files of records or text lines are read through a memory map,
+so large puzzle files are neither read into memory at once nor parsed in
+Python per character.
+
+Usage:
+    python packed.py puzzles.txt puzzles.bin --record 41
+    python packed.py puzzles.bin puzzles.txt --record 41 --unpack
+"""
+
+import argparse
+import mmap
+import os
+
+import bitboard
+
+BOXES = 81
+
+# The bundled puzzle files
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpora')
+
+# Record sizes of the binary formats
+RECORD_81 = 81
+RECORD_41 = 41
+record_sizes = {'bin81': RECORD_81, 'bin41': RECORD_41}
+formats = ('text',) + tuple(record_sizes)
+
+INVALID = 0xff
+
+# Byte of every text character: 1-9 for the digits, 0 for '.' and '0', INVALID otherwise
+PARSE = bytes(c - ord('0') if ord('1') <= c <= ord('9') else 0 if c in b'.0' else INVALID
+              for c in range(256))
+# Text character of every box byte
+TEXT = bytes(ord('.') if b == 0 else ord('0') + b if b <= 9 else ord('?') for b in range(256))
+# Candidate mask of every box byte, ALL for empty boxes
+CELL = (bitboard.ALL,) + tuple(1 << d for d in range(9))
+# Box byte of every candidate mask, 0 unless a single digit is left
+DIGIT = tuple(m.bit_length() if bitboard.bit_count[m] == 1 else 0 for m in range(bitboard.ALL + 1))
+# The two box bytes of every packed byte
+NIBBLES = tuple(bytes((b >> 4, b & 0xf)) for b in range(256))
+
+
+def parse(grid):
+    """
+    Parse a text grid into box bytes.
+    Args:
+        grid: 81 characters, str or bytes, digits for givens and '.' or '0'
+            for empties. Surrounding whitespace is ignored.
+    Returns:
+        81 bytes, or None if the grid is not a valid puzzle.
+    """
+    if isinstance(grid, str):
+        grid = grid.strip().encode('latin-1', 'replace')
+    else:
+        grid = grid.strip()
+    if len(grid) != BOXES:
+        return None
+    digits = grid.translate(PARSE)
+    if INVALID in digits:
+        return None
+    return digits
+
+
+def to_cells(digits):
+    """Convert box bytes into a list of candidate masks of bitboard.py."""
+    return [CELL[d] for d in digits]
+
+
+def from_cells(cells):
+    """Convert candidate masks into box bytes, 0 for unsolved boxes."""
+    return bytes([DIGIT[m] for m in cells])
+
+
+def to_grid(digits):
+    """Convert box bytes into an 81 character text grid, '.' for empty boxes."""
+    return digits.translate(TEXT).decode('ascii')
+
+
+def pack(digits):
+    """Pack 81 box bytes into a 41 byte record."""
+    padded = bytes(digits) + b'\0'
+    return bytes(a << 4 | b for a, b in zip(padded[0::2], padded[1::2]))
+
+
+def unpack(record):
+    """Unpack a 41 byte record into 81 box bytes."""
+    return b''.join([NIBBLES[b] for b in record])[:BOXES]
+
+
+def encode(digits, record=RECORD_81):
+    """Return the binary record of box bytes."""
+    return pack(digits) if record == RECORD_41 else bytes(digits)
+
+
+def decode(data, record=RECORD_81):
+    """Return the box bytes of a binary record."""
+    return unpack(data) if record == RECORD_41 else bytes(data)
+
+
+def map_file(f):
+    """Return a read-only memory map of an open file, or b'' if it is empty."""
+    if os.fstat(f.fileno()).st_size == 0:
+        return b''
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class PackedFile:
+    """
+    A memory-mapped file of fixed size binary records.
+
+    Indexing and iterating yield the box bytes of the records; indexing
+    decodes only the record asked for.
+    """
+
+    def __init__(self, path, record=RECORD_81):
+        self.record = record
+        self.file = open(path, 'rb')
+        self.map = map_file(self.file)
+        if len(self.map) % record:
+            self.close()
+            raise ValueError('{} is not made of {} byte records'.format(path, record))
+
+    def __len__(self):
+        return len(self.map) // self.record
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('record index out of range')
+        offset = index * self.record
+        return decode(self.map[offset:offset + self.record], self.record)
+
+    def __iter__(self):
+        record, data = self.record, self.map
+        for offset in range(0, len(data), record):
+            yield decode(data[offset:offset + record], record)
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_lines(path):
+    """Yield the non-blank lines of a text file through a memory map, as bytes."""
+    with open(path, 'rb') as f:
+        data = map_file(f)
+        try:
+            start = 0
+            while start < len(data):
+                end = data.find(b'\n', start)
+                if end < 0:
+                    end = len(data)
+                line = data[start:end].strip()
+                if line:
+                    yield line
+                start = end + 1
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+
+def read_corpus(path):
+    """Return the puzzle lines of a corpus file, skipping blank and comment lines."""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+def write_records(path, boards, record=RECORD_81):
+    """
+    Write box bytes as binary records.
+    Args:
+        path(string): the file to write.
+        boards: iterable of 81 box bytes each.
+        record(int): RECORD_81 or RECORD_41.
+    Returns:
+        The number of records written.
+    """
+    count = 0
+    with open(path, 'wb') as f:
+        for digits in boards:
+            f.write(encode(digits, record))
+            count += 1
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert puzzle files between text and binary records.")
+    parser.add_argument('input', help="text puzzle file, or record file with --unpack")
+    parser.add_argument('output', help="record file, or text puzzle file with --unpack")
+    parser.add_argument('-r', '--record', type=int, choices=(RECORD_81, RECORD_41), default=RECORD_81,
+                        help="bytes per record (default 81)")
+    parser.add_argument('-u', '--unpack', action='store_true', help="convert records back into text")
+    args = parser.parse_args(argv)
+
+    if args.unpack:
+        with PackedFile(args.input, args.record) as records, open(args.output, 'w') as out:
+            for digits in records:
+                out.write(to_grid(digits) + '\n')
+        return
+
+    def boards():
+        for number, line in enumerate(read_lines(args.input), 1):
+            digits = parse(line)
+            if digits is None:
+                parser.error('line {} is not a valid puzzle'.format(number))
+            yield digits
+
+    write_records(args.output, boards(), args.record)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import batch
+import bitboard
+import os
+import packed
+import shutil
+import tempfile
+import testdata
+import unittest
+
+
+class TestPacked(unittest.TestCase):
+    diagonal_grid = testdata.diagonal_grid
+    diagonal_solution = testdata.diagonal_solution
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def test_parse(self):
+        digits = packed.parse(self.diagonal_grid + '\n')
+        self.assertEqual(len(digits), 81)
+        self.assertEqual((digits[0], digits[1]), (2, 0))
+        self.assertEqual(packed.parse(self.diagonal_grid.replace('.', '0').encode()), digits)
+        self.assertEqual(packed.to_grid(digits), self.diagonal_grid)
+        self.assertEqual(packed.to_cells(digits), bitboard.grid_masks(self.diagonal_grid))
+        for bad in ('x' + self.diagonal_grid[1:], self.diagonal_grid[1:], 'é' + self.diagonal_grid[1:]):
+            self.assertIsNone(packed.parse(bad))
+
+    def test_pack_round_trip(self):
+        for grid in (self.diagonal_grid, self.diagonal_solution):
+            digits = packed.parse(grid)
+            record = packed.pack(digits)
+            self.assertEqual(len(record), packed.RECORD_41)
+            self.assertEqual(packed.unpack(record), digits)
+        solved = bitboard.grid_masks(self.diagonal_solution)
+        self.assertEqual(packed.to_grid(packed.from_cells(solved)), self.diagonal_solution)
+
+    def test_memory_mapped_records(self):
+        boards = [packed.parse(self.diagonal_grid), packed.parse(self.diagonal_solution)]
+        for record in (packed.RECORD_81, packed.RECORD_41):
+            path = self.path('puzzles.bin')
+            self.assertEqual(packed.write_records(path, boards, record), 2)
+            self.assertEqual(os.path.getsize(path), 2 * record)
+            with packed.PackedFile(path, record) as records:
+                self.assertEqual(len(records), 2)
+                self.assertEqual(list(records), boards)
+                self.assertEqual(records[-1], boards[1])
+                self.assertRaises(IndexError, records.__getitem__, 2)
+        self.assertRaises(ValueError, packed.PackedFile, path, packed.RECORD_81)
+        open(self.path('empty.bin'), 'w').close()
+        with packed.PackedFile(self.path('empty.bin')) as records:
+            self.assertEqual(list(records), [])
+
+    def test_batch_reads_every_format(self):
+        with open(self.path('puzzles.txt'), 'w') as f:
+            f.write(self.diagonal_grid + '\n\n' + self.diagonal_grid)
+        packed.main([self.path('puzzles.txt'), self.path('puzzles.bin'), '--record', '41'])
+        for path, format in (('puzzles.txt', 'text'), ('puzzles.bin', 'bin41')):
+            grids = list(batch.open_grids(self.path(path), format))
+            self.assertEqual(grids, [self.diagonal_grid] * 2)
+            self.assertEqual(list(batch.solve_many(grids)), [(batch.SOLVED, self.diagonal_solution)] * 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+"""
+Solve one sudoku on several cores by splitting its search tree.
+
+batch.py shares many puzzles among processes, which does nothing for a single
+hard puzzle. Here the puzzle is propagated once in this process, then the
+search is expanded breadth first, one branching level at a time, until the
+frontier holds `split` subproblems per worker. Each subproblem is the board
+after a few branching assignments; the workers search them independently and
+the pool is terminated as soon as one of them finds a solution, cancelling the
+subproblems still queued or running.
+
+Starting the pool costs tens of milliseconds, so this only pays off for
+puzzles whose search takes much longer than that. A puzzle with several
+solutions gets the one found first, which may differ from run to run.
+
+Usage:
+    python parallel.py corpora/diagonal.txt --workers 4
+"""
+
+import argparse
+import functools
+import multiprocessing
+import os
+from timeit import default_timer as timer
+
+import bitboard
+import packed
+import solution
+from geometry import standard
+
+# Subproblems per worker, more balance uneven subtrees better
+SPLIT = 4
+
+# The search run by a worker process, set by start_worker()
+worker_search = None
+
+
+def start_worker(search):
+    global worker_search
+    worker_search = search
+
+
+def run_search(board):
+    return worker_search(board)
+
+
+def expand(board, reduce, branches, size):
+    """
+    Split a search breadth first into subproblems.
+    Args:
+        board: the puzzle, in the form of the engine.
+        reduce: function propagating a board, returning it or False.
+        branches: function returning the boards of the branches of a reduced
+            board, None if it is solved.
+        size(int): number of subproblems wanted.
+    Returns:
+        A (solved, frontier) tuple: the solution if the expansion found one,
+        else None and the list of boards left to search, at least size of them
+        unless the search tree is smaller.
+    """
+    frontier = [board]
+    while frontier and len(frontier) < size:
+        level = []
+        for board in frontier:
+            board = reduce(board)
+            if board is False:
+                continue
+            children = branches(board)
+            if children is None:
+                return board, []
+            level.extend(children)
+        frontier = level
+    return None, frontier
+
+
+def first_solution(search, frontier, workers):
+    """
+    Search subproblems on a process pool.
+    Args:
+        search: picklable function solving one board, returning False if it has no solution.
+        frontier(list): the boards to search.
+        workers(int): number of processes.
+    Returns:
+        The first solution found, or False if no board has one.
+    """
+    with multiprocessing.Pool(min(workers, len(frontier)), start_worker, (search,)) as pool:
+        for solved in pool.imap_unordered(run_search, frontier):
+            if solved:
+                # Leaving the block terminates the workers still searching
+                return solved
+    return False
+
+
+def cell_branches(geometry):
+    """Return the branches() function of expand() for boards of candidate masks."""
+    def branches(cells):
+        s = bitboard.branch_box(cells, geometry)
+        if s is None:
+            return None
+        children = []
+        m = cells[s]
+        while m:
+            bit = m & -m
+            m ^= bit
+            child = cells[:]
+            child[s] = bit
+            children.append(child)
+        return children
+    return branches
+
+
+def solve_cells(cells, workers, propagation='trail', geometry=standard, split=SPLIT):
+    """
+    Solve a board of candidate masks with the bitmask engine on several processes.
+    Args:
+        cells(list): candidate masks.
+        workers(int): number of processes.
+        propagation(string): one of bitboard.propagations.
+        geometry(Geometry): the board layout.
+        split(int): subproblems per worker.
+    Returns:
+        The solved candidate masks or False if not solvable.
+    """
+    reducer = bitboard.reducers['queue' if propagation == 'trail' else propagation]
+    reduce = functools.partial(reducer, geometry=geometry)
+    solved, frontier = expand(cells[:], reduce, cell_branches(geometry), workers * split)
+    if solved or not frontier:
+        return solved or False
+    search = functools.partial(bitboard.solve_cells, propagation=propagation, geometry=geometry)
+    return first_solution(search, frontier, workers)
+
+
+def search_values(values, strategies=None, branching='mrv'):
+    """Solve a board in dictionary form like solve(), without a tracer or profile."""
+    return solution.solve_values(values, strategies=strategies, branching=branching)
+
+
+def solve_values(values, workers, strategies=None, branching='mrv', split=SPLIT):
+    """
+    Solve a board in dictionary form with the engine of solution.py on several processes.
+    Args:
+        values(dict): a sudoku in dictionary form.
+        workers(int): number of processes.
+        strategies(list): names of the propagation strategies, see solution.solve().
+        branching(string): name of the branching policy; the expansion itself
+            uses plain MRV when the policy is incremental.
+        split(int): subproblems per worker.
+    Returns:
+        The dictionary representation of the final sudoku grid. False if no solution exists.
+    """
+    strategy_list = solution.make_strategies(strategies or solution.default_strategies)
+    policy = solution.make_branching(branching)
+    if policy.incremental:
+        policy = solution.Branching()
+
+    def branches(values):
+        s = policy.choose_box(values)
+        if s is None:
+            return None
+        children = []
+        for value in policy.order_values(values, s):
+            child = values.copy()
+            solution.assign_value(child, s, value)
+            children.append(child)
+        return children
+
+    reduce = functools.partial(solution.reduce_puzzle, strategies=strategy_list)
+    solved, frontier = expand(values.copy(), reduce, branches, workers * split)
+    if solved or not frontier:
+        return solved or False
+    search = functools.partial(search_values, strategies=strategies, branching=branching)
+    return first_solution(search, frontier, workers)
+
+
+def time_solves(grids, engine, workers=1, repeat=1):
+    """Return the time in seconds to solve each puzzle, the fastest of repeat solves."""
+    times = []
+    for grid in grids:
+        best = float('inf')
+        for _ in range(repeat):
+            start = timer()
+            solution.solve(grid, engine, workers=workers)
+            best = min(best, timer() - start)
+        times.append(best)
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the speedup of solving single puzzles on several cores.")
+    parser.add_argument('input', nargs='?', default=os.path.join(packed.CORPUS_DIR, 'diagonal.txt'),
+                        help="file of diagonal puzzles, one per line (default the diagonal corpus)")
+    parser.add_argument('-e', '--engine', choices=('dict', 'bits', 'queue', 'trail'), default='dict',
+                        help="search engine (default dict)")
+    parser.add_argument('-w', '--workers', type=int, default=0,
+                        help="worker processes, 0 for one per core (default 0)")
+    parser.add_argument('-n', '--slowest', type=int, default=10,
+                        help="only time the puzzles slowest to solve on one core (default 10)")
+    parser.add_argument('-r', '--repeat', type=int, default=1,
+                        help="solves per puzzle, the fastest is kept (default 1)")
+    args = parser.parse_args(argv)
+    workers = args.workers or multiprocessing.cpu_count()
+
+    grids = packed.read_corpus(args.input)
+    # The puzzles whose latency splitting is meant to cut
+    single = time_solves(grids, args.engine)
+    slowest = sorted(range(len(grids)), key=single.__getitem__, reverse=True)[:args.slowest]
+    grids = [grids[i] for i in slowest]
+    single = time_solves(grids, args.engine, repeat=args.repeat)
+    parallel = time_solves(grids, args.engine, workers, args.repeat)
+    for grid, one, many in zip(grids, single, parallel):
+        print('{} {:9.2f} ms {:9.2f} ms {:6.2f}x'.format(grid, one * 1000, many * 1000, one / many))
+    print('{} puzzles, {} engine, {} workers on {} cores: {:.2f} ms -> {:.2f} ms, speedup {:.2f}x'.format(
+        len(grids), args.engine, workers, multiprocessing.cpu_count(), sum(single) * 1000,
+        sum(parallel) * 1000, sum(single) / sum(parallel)))
+
+if __name__ == '__main__':
+    main()
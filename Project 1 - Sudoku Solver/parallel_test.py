@@ -0,0 +1,39 @@
+import bitboard
+import parallel
+import solution
+import testdata
+import unittest
+
+
+class TestParallel(unittest.TestCase):
+    diag_sudoku_grid = testdata.diagonal_grid
+    unique_grid = testdata.unique_grid
+
+    def test_expand_keeps_the_solution(self):
+        reduce = bitboard.propagate
+        branches = parallel.cell_branches(bitboard.standard)
+        solved, frontier = parallel.expand(bitboard.grid_masks(self.unique_grid), reduce, branches, 8)
+        self.assertIsNone(solved)
+        self.assertGreaterEqual(len(frontier), 8)
+        expected = bitboard.solve_cells(bitboard.grid_masks(self.unique_grid), 'trail')
+        found = [cells for cells in (bitboard.solve_cells(cells, 'trail') for cells in frontier) if cells]
+        self.assertEqual(found, [expected])
+        # Propagation alone solves the diagonal example
+        solved, frontier = parallel.expand(bitboard.grid_masks(self.diag_sudoku_grid), reduce, branches, 8)
+        self.assertTrue(solved)
+        self.assertEqual(frontier, [])
+
+    def test_split_solve_matches_single_core(self):
+        expected = solution.solve(self.unique_grid, engine='dlx')
+        for engine in ('dict', 'trail', 'bits'):
+            self.assertEqual(solution.solve(self.unique_grid, engine, workers=2), expected)
+        self.assertEqual(solution.solve(self.unique_grid, 'dict', branching='buckets', workers=2), expected)
+        self.assertFalse(solution.solve('23' + self.unique_grid[2:], 'trail', workers=2))
+
+    def test_no_tracer_across_processes(self):
+        self.assertRaises(ValueError, solution.solve, self.unique_grid, tracer=solution.AssignmentTracer(),
+                          workers=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
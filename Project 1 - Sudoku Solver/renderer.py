@@ -0,0 +1,213 @@
+"""
+Cached, optionally headless rendering of sudoku boards with pygame.
+
+PySudoku.play() builds 81 SudokuSquare objects per frame, each loading a
+font, rendering its text and rebuilding its rounded tile. A BoardRenderer
+does that work once: one font, one glyph surface per digit and one tile per
+color. Each frame only redraws the boxes whose digit changed since the
+previous one and returns their rectangles, so the display updates just those.
+
+With headless=True pygame runs on the dummy video driver and the frames go
+to an off-screen surface, to be saved as images or as an animated GIF
+(which needs Pillow) without a display.
+
+pygame is optional: the module imports without it, but rendering raises
+ImportError.
+"""
+
+import os
+import sys
+
+try:
+    import pygame
+except ImportError:
+    pygame = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKGROUND = os.path.join(HERE, 'images', 'sudoku-board-bare.jpg')
+# Where SudokuSquare, which draws the rounded tiles, lives
+sys.path.append(os.path.join(HERE, 'objects'))
+
+digits = '123456789'
+rows = 'ABCDEFGHI'
+
+# Board layout of PySudoku.play(): window size, box pitch and band offsets
+SIZE = (700, 700)
+PITCH = 57
+X_OFFSETS = (38, 99, 159)
+Y_OFFSETS = (35, 100, 165)
+TILE = (45, 40)
+TEXT_OFFSET = (17, 4)
+
+SOLVED_COLOR = (2, 204, 186)
+EMPTY_COLOR = (255, 255, 255)
+TEXT_COLOR = (255, 255, 255)
+
+
+def require_pygame():
+    if pygame is None:
+        raise ImportError('Rendering requires pygame')
+
+
+def cell_origin(box):
+    """Return the pixel position of the top left corner of the tile of a box, e.g. 'A1'."""
+    y, x = rows.index(box[0]), digits.index(box[1])
+    return x * PITCH + X_OFFSETS[x // 3], y * PITCH + Y_OFFSETS[y // 3]
+
+
+def shown_digit(value):
+    """Return the digit shown for the value of a box, None unless it is solved."""
+    return value if len(value) == 1 and value in digits else None
+
+
+def changed_boxes(shown, values):
+    """
+    Compare a board to the digits on screen.
+    Args:
+        shown(dict): the digit shown in every box, None for blank boxes.
+        values(dict): a sudoku in dictionary form.
+    Returns:
+        A list of (box, digit) tuples for the boxes to redraw.
+    """
+    changes = []
+    for box in sorted(values):
+        digit = shown_digit(values[box])
+        if shown.get(box, False) != digit:
+            changes.append((box, digit))
+    return changes
+
+
+def rounded_tile(color):
+    """Return a transparent surface holding the rounded tile of a color."""
+    from SudokuSquare import AAfilledRoundedRect
+    tile = pygame.Surface(TILE, pygame.SRCALPHA)
+    AAfilledRoundedRect(tile, (0, 0) + TILE, color)
+    return tile
+
+
+class BoardRenderer:
+    """
+    Draws boards onto a surface, reusing its font, glyphs and tiles.
+
+    Args:
+        surface: the pygame surface to draw on, by default the display in a
+            window, or an off-screen surface when headless.
+        headless(bool): render without a display on the dummy video driver.
+        background(string): the board image.
+    """
+
+    def __init__(self, surface=None, headless=False, background=BACKGROUND):
+        require_pygame()
+        if headless:
+            os.environ['SDL_VIDEODRIVER'] = 'dummy'
+        pygame.init()
+        self.headless = headless
+        if surface is None:
+            surface = pygame.Surface(SIZE) if headless else pygame.display.set_mode(SIZE)
+        self.surface = surface
+        self.background = pygame.image.load(background)
+        if not headless:
+            self.background = self.background.convert()
+        self.font = pygame.font.SysFont('opensans', 21)
+        self.glyphs = dict((d, self.font.render(d, 1, TEXT_COLOR)) for d in digits)
+        self.tiles = {True: rounded_tile(SOLVED_COLOR), False: rounded_tile(EMPTY_COLOR)}
+        # The digit shown in every box, None before the first frame
+        self.shown = None
+
+    def draw_box(self, box, digit):
+        """Redraw one box over the background and return its rectangle."""
+        x, y = cell_origin(box)
+        rect = pygame.Rect((x, y) + TILE)
+        self.surface.blit(self.background, rect, rect)
+        self.surface.blit(self.tiles[digit is not None], rect)
+        if digit is not None:
+            self.surface.blit(self.glyphs[digit], (x + TEXT_OFFSET[0], y + TEXT_OFFSET[1]))
+        return rect
+
+    def draw(self, values):
+        """
+        Draw a board, only redrawing the boxes changed since the previous call.
+        Args:
+            values(dict): a sudoku in dictionary form.
+        Returns:
+            The list of rectangles drawn on.
+        """
+        if self.shown is None:
+            # The first frame draws the whole board
+            self.surface.blit(self.background, (0, 0))
+            self.shown = {}
+            for box, digit in changed_boxes(self.shown, values):
+                self.draw_box(box, digit)
+                self.shown[box] = digit
+            return [self.surface.get_rect()]
+        rects = []
+        for box, digit in changed_boxes(self.shown, values):
+            rects.append(self.draw_box(box, digit))
+            self.shown[box] = digit
+        return rects
+
+    def to_bytes(self):
+        """Return the RGB pixels of the surface."""
+        return pygame.image.tostring(self.surface, 'RGB')
+
+
+def play(values_list, fps=5):
+    """Replay boards in a window, updating only the changed boxes, until the window is closed."""
+    renderer = BoardRenderer()
+    clock = pygame.time.Clock()
+    for values in values_list:
+        pygame.event.pump()
+        pygame.display.update(renderer.draw(values))
+        clock.tick(fps)
+    # leave game showing until closed by user
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+
+
+def export_frames(values_list, directory, pattern='frame{:05d}.png'):
+    """
+    Render boards headless and save one image per board.
+    Returns:
+        The paths of the images.
+    """
+    renderer = BoardRenderer(headless=True)
+    paths = []
+    for index, values in enumerate(values_list):
+        renderer.draw(values)
+        path = os.path.join(directory, pattern.format(index))
+        pygame.image.save(renderer.surface, path)
+        paths.append(path)
+    return paths
+
+
+def export_gif(values_list, path, fps=5):
+    """
+    Render boards headless into an animated GIF, which needs Pillow.
+
+    Frames are rendered one at a time as Pillow asks for them and reduced to
+    a palette, a third of the size of an RGB frame. Pillow's GIF writer still
+    keeps the frames until the file is complete; export_frames() writes each
+    frame as soon as it is drawn.
+    Returns:
+        The number of frames.
+    """
+    from PIL import Image
+    renderer = BoardRenderer(headless=True)
+    count = 0
+
+    def frames():
+        nonlocal count
+        for values in values_list:
+            renderer.draw(values)
+            count += 1
+            image = Image.frombytes('RGB', renderer.surface.get_size(), renderer.to_bytes())
+            yield image.convert('P', palette=Image.ADAPTIVE)
+
+    rendered = frames()
+    first = next(rendered, None)
+    if first is not None:
+        first.save(path, save_all=True, append_images=rendered, duration=int(1000 / fps), loop=0)
+    return count
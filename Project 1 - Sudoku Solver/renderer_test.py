@@ -0,0 +1,40 @@
+import renderer
+import solution
+import testdata
+import unittest
+
+
+class TestRenderer(unittest.TestCase):
+    diag_sudoku_grid = testdata.diagonal_grid
+
+    def test_layout_matches_pysudoku(self):
+        self.assertEqual(renderer.cell_origin('A1'), (38, 35))
+        self.assertEqual(renderer.cell_origin('D4'), (3 * 57 + 99, 3 * 57 + 100))
+        self.assertEqual(renderer.cell_origin('I9'), (8 * 57 + 159, 8 * 57 + 165))
+
+    def test_changed_boxes(self):
+        values = solution.grid_values(self.diag_sudoku_grid)
+        shown = dict(renderer.changed_boxes({}, values))
+        self.assertEqual(len(shown), 81)
+        self.assertEqual(shown['A1'], '2')
+        self.assertIsNone(shown['A2'])
+        self.assertEqual(renderer.changed_boxes(shown, values), [])
+        values['A2'] = '7'
+        values['A3'] = '45'
+        self.assertEqual(renderer.changed_boxes(shown, values), [('A2', '7')])
+
+    @unittest.skipIf(renderer.pygame is None, 'pygame is not installed')
+    def test_headless_frames_redraw_changes_only(self):
+        board = renderer.BoardRenderer(headless=True)
+        values = solution.grid_values(self.diag_sudoku_grid)
+        self.assertEqual(board.draw(values), [board.surface.get_rect()])
+        first = board.to_bytes()
+        self.assertEqual(board.draw(values), [])
+        values['A2'] = '7'
+        rects = board.draw(values)
+        self.assertEqual([tuple(rect.topleft) for rect in rects], [renderer.cell_origin('A2')])
+        self.assertNotEqual(board.to_bytes(), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
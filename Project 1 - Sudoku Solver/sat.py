@@ -0,0 +1,381 @@
+"""
+SAT backend: the sudoku as a CNF formula solved by a small CDCL solver.
+
+Variable v(i, k) = i * n + k + 1 is true when box i holds symbol k. The
+clauses of a board layout say that every box holds a symbol, no box holds two,
+every unit of `unitlist` holds every symbol and no two peers hold the same
+one. They only depend on the geometry, so they are built once per geometry
+and shared by every puzzle; a puzzle only adds its givens as unit clauses.
+
+The solver is conflict driven: unit propagation with two watched literals per
+clause (the two-literal clauses, which make up most of the formula, keep
+static implication lists instead), first-UIP clause learning with
+non-chronological backjumping, and VSIDS-style variable activities with
+saved phases for the decisions. Counting solutions adds a blocking clause
+per solution found and keeps the learnt clauses for the next one.
+"""
+
+from geometry import standard
+import bitboard
+
+# Built formulas by geometry, see formula_for()
+formulas = {}
+
+
+class Formula:
+    """
+    The static clauses of a geometry.
+
+    `binary[lit]` lists the literals implied when lit becomes true, both
+    directions of every two-literal clause. `long` holds the longer clauses.
+    Literals are non-zero integers, -l being the negation of l.
+    """
+
+    def __init__(self, geometry=standard):
+        n = geometry.n
+        self.geometry = geometry
+        self.variables = len(geometry.boxes) * n
+        # Indexed by literal: positive literals from the front, negative ones wrap from the back
+        self.binary = [[] for _ in range(2 * self.variables + 1)]
+        self.long = []
+        self.binary_count = 0
+
+        def var(i, k):
+            return i * n + k + 1
+
+        for i in range(len(geometry.boxes)):
+            self.long.append(tuple(var(i, k) for k in range(n)))
+            for k in range(n):
+                for l in range(k + 1, n):
+                    self.add_binary(-var(i, k), -var(i, l))
+                for j in geometry.peer_cells[i]:
+                    if j > i:
+                        self.add_binary(-var(i, k), -var(j, k))
+        for unit in geometry.unit_cells:
+            for k in range(n):
+                self.long.append(tuple(var(i, k) for i in unit))
+
+    def add_binary(self, a, b):
+        """Add the clause (a or b)."""
+        self.binary[-a].append(b)
+        self.binary[-b].append(a)
+        self.binary_count += 1
+
+
+def formula_for(geometry=standard):
+    """Return the formula of a geometry, building it on first use."""
+    if geometry not in formulas:
+        formulas[geometry] = Formula(geometry)
+    return formulas[geometry]
+
+
+class Solver:
+    """
+    A CDCL solver over a Formula plus the unit and learnt clauses of one puzzle.
+
+    Counters: `decisions`, `conflicts` and `propagations` (literals assigned
+    by propagation).
+    """
+
+    def __init__(self, formula):
+        self.formula = formula
+        size = 2 * formula.variables + 1
+        self.binary = formula.binary
+        # value[lit] is 1 if lit is true, -1 if false and 0 if unassigned
+        self.value = [0] * size
+        self.level = [0] * (formula.variables + 1)
+        self.reason = [None] * (formula.variables + 1)
+        self.activity = [0.0] * (formula.variables + 1)
+        self.phase = [1] * (formula.variables + 1)
+        self.seen = [False] * (formula.variables + 1)
+        self.increment = 1.0
+        self.trail = []
+        self.trail_lim = []
+        self.qhead = 0
+        self.ok = True
+        self.watches = [[] for _ in range(size)]
+        for clause in formula.long:
+            self.watch(list(clause))
+        self.decisions = 0
+        self.conflicts = 0
+        self.propagations = 0
+
+    def watch(self, clause):
+        """Watch the first two literals of a clause."""
+        self.watches[clause[0]].append(clause)
+        self.watches[clause[1]].append(clause)
+
+    def assign(self, lit, reason):
+        self.value[lit] = 1
+        self.value[-lit] = -1
+        v = abs(lit)
+        self.level[v] = len(self.trail_lim)
+        self.reason[v] = reason
+        self.trail.append(lit)
+
+    def add_clause(self, literals):
+        """
+        Add a clause at the root level, backtracking to it first.
+        Returns:
+            False if the formula became unsatisfiable.
+        """
+        self.backtrack(0)
+        value = self.value
+        if any(value[lit] > 0 for lit in literals):
+            return True
+        literals = [lit for lit in set(literals) if value[lit] == 0]
+        if not literals:
+            self.ok = False
+        elif len(literals) == 1:
+            self.assign(literals[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.watch(literals)
+        return self.ok
+
+    def add_units(self, literals):
+        """
+        Add unit clauses at the root level and propagate them together.
+        Returns:
+            False if the formula became unsatisfiable.
+        """
+        self.backtrack(0)
+        for lit in literals:
+            if self.value[lit] < 0:
+                self.ok = False
+                return False
+            if self.value[lit] == 0:
+                self.assign(lit, None)
+        self.ok = self.ok and self.propagate() is None
+        return self.ok
+
+    def propagate(self):
+        """
+        Propagate the trail from qhead.
+        Returns:
+            The clause found false, or None.
+        """
+        value, trail, binary, watches = self.value, self.trail, self.binary, self.watches
+        while self.qhead < len(trail):
+            p = trail[self.qhead]
+            self.qhead += 1
+            for q in binary[p]:
+                if value[q] == 0:
+                    self.assign(q, (q, -p))
+                    self.propagations += 1
+                elif value[q] < 0:
+                    return (q, -p)
+            false_lit = -p
+            clauses = watches[false_lit]
+            kept = []
+            for position, clause in enumerate(clauses):
+                # Keep the false watched literal second
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], false_lit
+                first = clause[0]
+                if value[first] > 0:
+                    kept.append(clause)
+                    continue
+                for k in range(2, len(clause)):
+                    if value[clause[k]] >= 0:
+                        clause[1], clause[k] = clause[k], false_lit
+                        watches[clause[1]].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if value[first] < 0:
+                        kept.extend(clauses[position + 1:])
+                        watches[false_lit] = kept
+                        return clause
+                    self.assign(first, clause)
+                    self.propagations += 1
+            watches[false_lit] = kept
+        return None
+
+    def analyze(self, conflict):
+        """
+        Derive the first-UIP clause of a conflict.
+        Returns:
+            A (learnt clause, backjump level) tuple, the asserting literal first.
+        """
+        seen, level, trail = self.seen, self.level, self.trail
+        current = len(self.trail_lim)
+        learnt = [0]
+        pending = 0
+        p = 0
+        index = len(trail) - 1
+        clause = conflict
+        while True:
+            for q in clause:
+                v = abs(q)
+                if q != p and not seen[v] and level[v] > 0:
+                    seen[v] = True
+                    self.bump(v)
+                    if level[v] == current:
+                        pending += 1
+                    else:
+                        learnt.append(q)
+            while not seen[abs(trail[index])]:
+                index -= 1
+            p = trail[index]
+            index -= 1
+            v = abs(p)
+            seen[v] = False
+            pending -= 1
+            if not pending:
+                break
+            clause = self.reason[v]
+        learnt[0] = -p
+        for q in learnt[1:]:
+            seen[abs(q)] = False
+        if len(learnt) == 1:
+            return learnt, 0
+        # Watch the literal of the highest level besides the asserting one
+        best = max(range(1, len(learnt)), key=lambda k: level[abs(learnt[k])])
+        learnt[1], learnt[best] = learnt[best], learnt[1]
+        return learnt, level[abs(learnt[1])]
+
+    def bump(self, v):
+        self.activity[v] += self.increment
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.increment *= 1e-100
+
+    def backtrack(self, target):
+        """Undo the assignments above decision level target."""
+        if len(self.trail_lim) <= target:
+            return
+        value, reason, phase, trail = self.value, self.reason, self.phase, self.trail
+        for lit in trail[self.trail_lim[target]:]:
+            value[lit] = value[-lit] = 0
+            v = abs(lit)
+            reason[v] = None
+            phase[v] = 1 if lit > 0 else -1
+        del trail[self.trail_lim[target]:]
+        del self.trail_lim[target:]
+        self.qhead = len(trail)
+
+    def pick(self):
+        """Return the unassigned variable of highest activity in its saved phase, or 0."""
+        value, activity = self.value, self.activity
+        best, best_activity = 0, -1.0
+        for v in range(1, len(activity)):
+            if value[v] == 0 and activity[v] > best_activity:
+                best, best_activity = v, activity[v]
+        return best * self.phase[best]
+
+    def solve(self):
+        """
+        Search for a model of the clauses.
+        Returns:
+            True if one was found, then read by model(), False if there is none.
+        """
+        if not self.ok:
+            return False
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                if not self.trail_lim:
+                    self.ok = False
+                    return False
+                learnt, target = self.analyze(conflict)
+                self.backtrack(target)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.watch(learnt)
+                    self.assign(learnt[0], learnt)
+                self.increment *= 1.05
+                continue
+            lit = self.pick()
+            if not lit:
+                return True
+            self.decisions += 1
+            self.trail_lim.append(len(self.trail))
+            self.assign(lit, None)
+
+    def model(self):
+        """Return the true variables of the last model."""
+        return [v for v in range(1, self.formula.variables + 1) if self.value[v] > 0]
+
+
+def load_cells(cells, geometry=standard):
+    """
+    Make a Solver for a board of candidate masks, every ruled out symbol a unit clause.
+    Returns:
+        The solver, whose `ok` is False if the givens already clash.
+    """
+    solver = Solver(formula_for(geometry))
+    n = geometry.n
+    units = []
+    for i, m in enumerate(cells):
+        if m != geometry.ALL:
+            units.extend(i * n + k + 1 if m >> k & 1 else -(i * n + k + 1) for k in range(n))
+    solver.add_units(units)
+    return solver
+
+
+def model_cells(model, geometry=standard):
+    """Convert the true variables of a model into candidate masks."""
+    cells = [0] * len(geometry.boxes)
+    for v in model:
+        i, k = divmod(v - 1, geometry.n)
+        cells[i] = 1 << k
+    return cells
+
+
+def record(solver, stats):
+    """Add the counters of a solver to a bitboard.SearchStats: decisions as nodes, propagations as rounds."""
+    if stats is not None:
+        stats.nodes += solver.decisions
+        stats.rounds += solver.propagations
+
+
+def solve_cells(cells, geometry=standard, stats=None):
+    """
+    Solve a board of candidate masks with the SAT solver.
+    Args:
+        cells(list): candidate masks, see bitboard.py.
+        geometry(Geometry): the board layout.
+        stats(SearchStats): optional counters, see record().
+    Returns:
+        The solved candidate masks or False if not solvable.
+    """
+    solver = load_cells(cells, geometry)
+    found = solver.solve()
+    record(solver, stats)
+    return found and model_cells(solver.model(), geometry)
+
+
+def count_cells(cells, limit=None, geometry=standard, stats=None):
+    """Count the solutions of a board of candidate masks, stopping at limit."""
+    solver = load_cells(cells, geometry)
+    found = 0
+    while (limit is None or found < limit) and solver.solve():
+        found += 1
+        # Block this solution; the learnt clauses carry over to the next search
+        if not solver.add_clause([-v for v in solver.model()]):
+            break
+    record(solver, stats)
+    return found
+
+
+def count_solutions(grid, limit=2):
+    """
+    Count the solutions of a Sudoku grid, stopping as soon as limit are found.
+    With the default limit, 0 means unsolvable, 1 unique and 2 ambiguous.
+    """
+    return count_cells(bitboard.grid_masks(grid), limit)
+
+
+def solve(grid):
+    """
+    Find the solution to a Sudoku grid with the SAT solver.
+    Args:
+        grid(string): a string representing a sudoku grid.
+    Returns:
+        The dictionary representation of the final sudoku grid. False if no solution exists.
+    """
+    cells = solve_cells(bitboard.grid_masks(grid))
+    return cells and bitboard.to_values(cells)
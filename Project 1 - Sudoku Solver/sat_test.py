@@ -0,0 +1,50 @@
+import bitboard
+import sat
+import solution
+import testdata
+import unittest
+from geometry import Geometry
+
+
+def is_valid_solution(values):
+    return all(sorted(values[box] for box in unit) == list('123456789') for unit in solution.unitlist)
+
+
+class TestSat(unittest.TestCase):
+    diagonal_grid = testdata.diagonal_grid
+    hard_grid = testdata.hard_grid
+
+    def test_formula_is_cached(self):
+        formula = sat.formula_for()
+        self.assertIs(sat.formula_for(), formula)
+        self.assertEqual(formula.variables, 729)
+        # One clause per box, then one per unit and digit
+        self.assertEqual(len(formula.long), 81 + 29 * 9)
+
+    def test_solve_matches_dict_engine(self):
+        self.assertEqual(solution.solve(self.diagonal_grid, engine='sat'),
+                         solution.solve(self.diagonal_grid))
+        self.assertTrue(is_valid_solution(sat.solve('.' * 81)))
+        self.assertFalse(sat.solve('11' + '.' * 79))
+
+    def test_count_solutions(self):
+        self.assertEqual(sat.count_solutions(self.diagonal_grid), 1)
+        self.assertEqual(sat.count_solutions('11' + '.' * 79), 0)
+        self.assertEqual(solution.count_solutions(self.hard_grid, limit=None, engine='sat'),
+                         solution.count_solutions(self.hard_grid, limit=None))
+
+    def test_other_geometries(self):
+        geometry = Geometry(4, diagonal=False)
+        cells = [geometry.ALL] * len(geometry.boxes)
+        cells[0] = cells[17] = 1
+        stats = bitboard.SearchStats()
+        self.assertFalse(sat.solve_cells(cells, geometry, stats))
+        cells[17] = 2
+        solved = sat.solve_cells(cells, geometry, stats)
+        self.assertEqual((solved[0], solved[17]), (1, 2))
+        self.assertTrue(all(sum(solved[i] for i in unit) == geometry.ALL for unit in geometry.unit_cells))
+        self.assertGreater(stats.rounds, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Measure how the bitmask engine scales with the board size.
+
+For each square size (3 for 9x9, 4 for 16x16, 5 for 25x25) puzzles are made
+by relabeling the symbols of one solved board and clearing a share of its
+boxes, then solved with the chosen propagation.
+
+Usage:
+    python scaling.py --sizes 3 4 5 --puzzles 20 --empty 0.5
+"""
+
+import argparse
+import random
+from timeit import default_timer as timer
+
+import bitboard
+from geometry import Geometry
+
+
+def make_puzzles(geometry, count, empty=0.5, seed=0):
+    """
+    Make puzzles for a geometry from one solved board.
+    Args:
+        geometry(Geometry): the board layout.
+        count(int): number of puzzles.
+        empty(float): share of the boxes cleared in each puzzle.
+        seed(int): seed of the random relabeling and clearing.
+    Returns:
+        A list of puzzles, each a list of candidate masks.
+    """
+    rng = random.Random(seed)
+    solved = bitboard.solve_cells([geometry.ALL] * len(geometry.boxes), 'trail', geometry)
+    bits = [1 << k for k in range(geometry.n)]
+    puzzles = []
+    for _ in range(count):
+        relabel = dict(zip(bits, rng.sample(bits, len(bits))))
+        cells = [relabel[m] for m in solved]
+        for i in rng.sample(range(len(cells)), int(len(cells) * empty)):
+            cells[i] = geometry.ALL
+        puzzles.append(cells)
+    return puzzles
+
+
+def time_puzzles(geometry, puzzles, propagation='trail'):
+    """Return the sorted solve times of the puzzles in seconds."""
+    times = []
+    for cells in puzzles:
+        start = timer()
+        if not bitboard.solve_cells(cells[:], propagation, geometry):
+            raise AssertionError('A generated puzzle could not be solved')
+        times.append(timer() - start)
+    return sorted(times)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the bitmask engine on growing boards.")
+    parser.add_argument('-s', '--sizes', type=int, nargs='+', default=[3, 4, 5],
+                        help="square sizes, 3 for 9x9 boards (default 3 4 5)")
+    parser.add_argument('-n', '--puzzles', type=int, default=20,
+                        help="puzzles per size (default 20)")
+    parser.add_argument('-e', '--empty', type=float, default=0.5,
+                        help="share of empty boxes (default 0.5)")
+    parser.add_argument('-p', '--propagation', choices=bitboard.propagations, default='trail',
+                        help="propagation engine (default trail)")
+    parser.add_argument('--no-diagonal', action='store_true',
+                        help="solve without the diagonal units")
+    args = parser.parse_args(argv)
+
+    print('{:>7}  {:>6}  {:>11}  {:>11}  {:>11}'.format('board', 'boxes', 'setup ms', 'median ms', 'max ms'))
+    for size in args.sizes:
+        start = timer()
+        geometry = Geometry(size, diagonal=not args.no_diagonal)
+        setup = timer() - start
+        times = time_puzzles(geometry, make_puzzles(geometry, args.puzzles, args.empty), args.propagation)
+        print('{:>7}  {:>6d}  {:>11.2f}  {:>11.2f}  {:>11.2f}'.format(
+            '{0}x{0}'.format(geometry.n), len(geometry.boxes), setup * 1000,
+            times[len(times) // 2] * 1000, times[-1] * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+An editable sudoku kept propagated between edits.
+
+An interactive editor that calls solve() after every keystroke parses the
+grid and propagates the whole board again each time. A Session holds the
+propagated candidate masks of the bitmask engine instead. Setting a box writes
+its digit and propagates from that box alone with bitboard.propagate(),
+recording every write on an undo trail. Each edit remembers the length of the
+trail before it, a checkpoint: clearing the latest edit rolls the trail back to
+its checkpoint, and clearing an older one rolls back to that edit's checkpoint
+and sets the later edits again, propagating them together in one pass.
+
+Propagation alone can miss that a board has no solution. solution() searches
+for one and keeps it: a solution stays valid when a box is cleared, or set to
+the digit it already has in the solution, so most edits need no new search.
+"""
+
+import bitboard
+from geometry import standard
+
+
+class Session:
+    """
+    A board edited box by box.
+
+    Args:
+        grid(string): the puzzle to start from, empty by default.
+        geometry(Geometry): the board layout.
+    """
+
+    def __init__(self, grid=None, geometry=standard):
+        self.geometry = geometry
+        self.cells = [geometry.ALL] * len(geometry.boxes)
+        self.trail = []
+        # The boxes set, in order, as (index, mask, checkpoint) tuples
+        self.edits = []
+        # Position in edits of the first edit propagated with the one that
+        # made the board contradictory
+        self.conflict = None
+        # A solution of the current board, None if unknown, False if there is none
+        self.solved = None
+        if grid:
+            self.apply([(i, m) for i, m in enumerate(geometry.grid_masks(grid)) if m != geometry.ALL])
+
+    def index(self, box):
+        """Return the index of a box name, e.g. 'A1'."""
+        if box not in self.geometry.box_index:
+            raise KeyError('Unknown box: {}'.format(box))
+        return self.geometry.box_index[box]
+
+    def apply(self, masks):
+        """
+        Set boxes to digits and propagate them together, unless the board is
+        already contradictory. The edits share one checkpoint.
+        Args:
+            masks(list): (index, digit mask) pairs.
+        """
+        checkpoint = len(self.trail)
+        first = len(self.edits)
+        self.edits.extend((i, m, checkpoint) for i, m in masks)
+        if self.solved and any(self.solved[i] != m for i, m in masks):
+            self.solved = None
+        if self.conflict is not None:
+            return
+        consistent = True
+        for i, m in masks:
+            if not self.cells[i] & m:
+                consistent = False
+                break
+            self.trail.append((i, self.cells[i]))
+            self.cells[i] = m
+        if consistent:
+            changed = [i for i, _ in masks]
+            consistent = bitboard.propagate(self.cells, changed, self.trail, self.geometry) is not False
+        if not consistent:
+            # Keep the candidates of the board before the contradiction
+            bitboard.undo(self.cells, self.trail, checkpoint)
+            self.conflict = first
+
+    def set_cell(self, box, digit):
+        """
+        Set a box to a digit, replacing its previous digit if it had one.
+        Args:
+            box(string): the box name, e.g. 'A1'.
+            digit(string): one of the symbols of the board.
+        Returns:
+            True unless propagation found the board contradictory.
+        """
+        if digit not in self.geometry.symbol_mask:
+            raise ValueError('Unknown symbol: {}'.format(digit))
+        i = self.index(box)
+        if any(j == i for j, _, _ in self.edits):
+            self.clear_cell(box)
+        self.apply([(i, self.geometry.symbol_mask[digit])])
+        return self.consistent
+
+    def clear_cell(self, box):
+        """
+        Clear a box set before, restoring the candidates of the board without it.
+        Returns:
+            True unless propagation found the board contradictory.
+        """
+        i = self.index(box)
+        for k, (j, _, checkpoint) in enumerate(self.edits):
+            if j == i:
+                break
+        else:
+            return self.consistent
+        # Edits propagated together share their checkpoint and are undone together
+        while k and self.edits[k - 1][2] == checkpoint:
+            k -= 1
+        later = [(j, m) for j, m, _ in self.edits[k:] if j != i]
+        bitboard.undo(self.cells, self.trail, checkpoint)
+        del self.edits[k:]
+        if self.conflict is not None and self.conflict >= k:
+            self.conflict = None
+        if self.solved is False:
+            self.solved = None
+        if later:
+            self.apply(later)
+        return self.consistent
+
+    @property
+    def consistent(self):
+        """False if propagation found that the board has no solution."""
+        return self.conflict is None
+
+    def candidates(self, box):
+        """Return the digits still possible in a box."""
+        return self.geometry.mask_symbols(self.cells[self.index(box)])
+
+    def values(self):
+        """
+        Return the propagated board in the dictionary form of solution.py. After
+        a contradiction, the board before the edit that caused it.
+        """
+        return self.geometry.to_values(self.cells)
+
+    def grid(self):
+        """Return the boxes set, as a grid string."""
+        cells = [self.geometry.ALL] * len(self.cells)
+        for i, m, _ in self.edits:
+            cells[i] = m
+        return self.geometry.to_grid(cells)
+
+    def solution(self):
+        """
+        Find a solution of the board, reusing the last one found while it still fits.
+        Returns:
+            The dictionary form of a solution, or False if the board has none.
+        """
+        if self.solved is None:
+            if self.conflict is not None:
+                self.solved = False
+            else:
+                # The board is propagated already, search from it as it is
+                self.solved = bitboard.search_trail(self.cells[:], changed=(), geometry=self.geometry)
+        return self.geometry.to_values(self.solved) if self.solved else False
+
+    def solvable(self):
+        """Return True if the board has at least one solution."""
+        return bool(self.solution())
@@ -0,0 +1,65 @@
+import bitboard
+import session
+import solution
+import testdata
+import unittest
+
+
+class TestSession(unittest.TestCase):
+    diag_sudoku_grid = testdata.diagonal_grid
+    unique_grid = testdata.unique_grid
+
+    def propagated(self, grid):
+        return bitboard.to_values(bitboard.propagate(bitboard.grid_masks(grid)))
+
+    def test_edits_match_propagating_from_scratch(self):
+        board = session.Session()
+        for box, digit in zip(solution.boxes, self.unique_grid):
+            if digit != '.':
+                self.assertTrue(board.set_cell(box, digit))
+        self.assertEqual(board.grid(), self.unique_grid)
+        self.assertEqual(board.values(), self.propagated(self.unique_grid))
+        # Clearing the latest and an older edit, then replacing a digit
+        board.clear_cell('H8')
+        self.assertEqual(board.values(), self.propagated(self.unique_grid[:70] + '.' + self.unique_grid[71:]))
+        board.clear_cell('A1')
+        board.set_cell('H8', '6')
+        self.assertEqual(board.values(), self.propagated('.' + self.unique_grid[1:]))
+        for digit in board.candidates('A5'):
+            grid = '.' + self.unique_grid[1:4] + digit + self.unique_grid[5:]
+            consistent = board.set_cell('A5', digit)
+            self.assertEqual(consistent, bitboard.propagate(bitboard.grid_masks(grid)) is not False)
+            if consistent:
+                self.assertEqual(board.values(), self.propagated(grid))
+        self.assertEqual(session.Session(self.unique_grid).values(), self.propagated(self.unique_grid))
+
+    def test_contradictions(self):
+        board = session.Session(self.diag_sudoku_grid)
+        before = board.values()
+        self.assertFalse(board.set_cell('A2', '2'))
+        self.assertFalse(board.consistent)
+        self.assertEqual(board.values(), before)
+        self.assertFalse(board.solvable())
+        # Edits made meanwhile are kept and propagated once the conflict is cleared
+        board.clear_cell('I9')
+        self.assertTrue(board.clear_cell('A2'))
+        self.assertEqual(board.values(), self.propagated(self.diag_sudoku_grid[:80] + '.'))
+        self.assertRaises(ValueError, board.set_cell, 'A2', 'x')
+        self.assertRaises(KeyError, board.clear_cell, 'Z9')
+
+    def test_solution_is_reused_while_it_fits(self):
+        board = session.Session(self.unique_grid)
+        expected = solution.solve(self.unique_grid, engine='dlx')
+        self.assertEqual(board.solution(), expected)
+        solved = board.solved
+        board.set_cell('A2', expected['A2'])
+        board.clear_cell('A1')
+        self.assertIs(board.solved, solved)
+        wrong = next(d for d in board.candidates('B2') if d != expected['B2'])
+        board.set_cell('B2', wrong)
+        self.assertIsNone(board.solved)
+        self.assertEqual(board.solvable(), bool(solution.solve(board.grid(), engine='dlx')))
+
+
+if __name__ == '__main__':
+    unittest.main()
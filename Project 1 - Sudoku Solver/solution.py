@@ -2,7 +2,12 @@
 
 #### Utils #####################################################################
 
+import argparse
+import functools
 import itertools
+import sys
+from collections import deque
+from timeit import default_timer as timer
 
 
 def cross(A, B):
@@ -39,50 +44,128 @@ def display(values):
 
 ################################################################################
 
-assignments = []
+class AssignmentTracer:
+    """
+    Opt-in record of the updates made to the board during one solve.
 
-def assign_value(values, box, value):
+    Each update is kept as a (box, old, new) diff instead of a copy of the
+    board. At most maxlen diffs are kept: when the buffer is full the oldest
+    diff is folded into the base board, so replay() still rebuilds exact
+    boards for the diffs that are left.
+    """
+
+    def __init__(self, maxlen=100000):
+        self.base = {}
+        self.diffs = deque(maxlen=maxlen)
+        self.dropped = 0
+
+    def start(self, values):
+        """Start recording from the given board."""
+        self.base = values.copy()
+        self.diffs.clear()
+        self.dropped = 0
+
+    def record(self, box, old, new):
+        """Record that box changed from old to new."""
+        if len(self.diffs) == self.diffs.maxlen:
+            dropped_box, _, dropped_new = self.diffs.popleft()
+            self.base[dropped_box] = dropped_new
+            self.dropped += 1
+        self.diffs.append((box, old, new))
+
+    def replay(self, solved_only=True):
+        """
+        Rebuild the boards seen during the solve.
+        Args:
+            solved_only(bool): only yield boards where a box has just been solved.
+        Returns:
+            A generator of board dictionaries, starting with the base board.
+        """
+        values = self.base.copy()
+        yield values.copy()
+        for box, old, new in self.diffs:
+            values[box] = new
+            if not solved_only or len(new) == 1:
+                yield values.copy()
+
+
+def assign_value(values, box, value, tracer=None):
     """
     Please use this function to update your values dictionary!
-    Assigns a value to a given box. If it updates the board record it.
+    Assigns a value to a given box. If it updates the board and a tracer is given, record it.
     """
 
-    # Don't waste memory appending actions that don't actually change any values
-    if values[box] == value:
+    # Don't waste memory recording actions that don't actually change any values
+    old = values[box]
+    if old == value:
         return values
 
     values[box] = value
-    if len(value) == 1:
-        assignments.append(values.copy())
+    if tracer is not None:
+        tracer.record(box, old, value)
     return values
 
-def naked_twins(values):
+def naked_twins(values, tracer=None):
     """Eliminate values using the naked twins strategy.
     Args:
         values(dict): a dictionary of the form {'box_name': '123456789', ...}
+        tracer(AssignmentTracer): optional record of the updates.
 
     Returns:
         the values dictionary with the naked twins eliminated from peers.
     """
-    # Naked twins: two boxes in same unit that have a pair of identical digits
-    # remaining as their only possibilities
-    for unit in unitlist:
-        # Find all boxes with two digits remaining as possibilities
-        pairs = [box for box in unit if len(values[box]) == 2]
-        # Pairwise combinations
-        poss_twins = [list(pair) for pair in itertools.combinations(pairs, 2)]
-        for pair in poss_twins:
-            box1 = pair[0]
-            box2 = pair[1]
-            # Find the naked twins
-            if values[box1] == values[box2]:
-                for box in unit:
-                    # Eliminate the naked twins as possibilities for peers
-                    if box != box1 and box != box2:
-                        for digit in values[box1]:
-                            values[box] = values[box].replace(digit,'')
+    naked_subsets(values, 2, tracer=tracer)
     return values
 
+def naked_subsets(values, size=2, seen=None, tracer=None):
+    """Eliminate values using naked twins (size 2), triples (3) or quads (4).
+
+    A naked subset is a group of `size` boxes in a unit whose candidates are
+    together exactly `size` digits: those digits can go nowhere else in the unit.
+    Args:
+        values(dict): a dictionary of the form {'box_name': '123456789', ...}
+        size(int): number of boxes in the subset.
+        seen(dict): optional state kept across passes. Units left unchanged by a
+            pass are recorded, and skipped while their boxes stay the same.
+        tracer(AssignmentTracer): optional record of the updates.
+
+    Returns:
+        The number of digits eliminated.
+    """
+    eliminated = 0
+    for u, unit in enumerate(unitlist):
+        if seen is not None:
+            state = tuple(values[box] for box in unit)
+            if seen.get((size, u)) == state:
+                continue
+        if size == 2:
+            # Twins have identical candidates: group the two-digit boxes by value
+            groups = {}
+            for box in unit:
+                if len(values[box]) == 2:
+                    groups.setdefault(values[box], []).append(box)
+            subsets = [(digits, group) for digits, group in groups.items() if len(group) == 2]
+        else:
+            candidates = [box for box in unit if 1 < len(values[box]) <= size]
+            subsets = []
+            for group in itertools.combinations(candidates, size):
+                digits = set(''.join(values[box] for box in group))
+                if len(digits) == size:
+                    subsets.append((digits, group))
+        unit_eliminated = 0
+        for digits, group in subsets:
+            for box in unit:
+                if box not in group:
+                    remaining = ''.join(d for d in values[box] if d not in digits)
+                    unit_eliminated += len(values[box]) - len(remaining)
+                    assign_value(values, box, remaining, tracer)
+        eliminated += unit_eliminated
+        # An elimination can expose a new subset, so only a unit with nothing to
+        # eliminate is known to be done for as long as it stays the same
+        if seen is not None and not unit_eliminated:
+            seen[(size, u)] = state
+    return eliminated
+
 def grid_values(grid):
     """
     Convert grid into a dict of {square: char} with '123456789' for empties.
@@ -104,7 +187,7 @@ def grid_values(grid):
     assert len(chars) == 81
     return dict(zip(boxes, chars))
 
-def eliminate(values):
+def eliminate(values, tracer=None):
     """Convert grid string into {<box>: <value>} dict with '123456789' value for empties.
 
     Args:
@@ -119,10 +202,10 @@ def eliminate(values):
         digit = values[box]
         # Remove solved digit from the list of possible values for each peer
         for peer in peers[box]:
-            values[peer] = values[peer].replace(digit,'')
+            assign_value(values, peer, values[peer].replace(digit,''), tracer)
     return values
 
-def only_choice(values):
+def only_choice(values, tracer=None):
     """Finalize all values that are the only choice for a unit.
 
     Go through all the units, and whenever there is a unit with a value
@@ -137,10 +220,10 @@ def only_choice(values):
             dplaces = [box for box in unit if digit in values[box]]
             if len(dplaces) == 1:
                 # This box is the only choice for this digit
-                values = assign_value(values, dplaces[0], digit)
+                values = assign_value(values, dplaces[0], digit, tracer)
     return values
 
-def single_possibility(values):
+def single_possibility(values, tracer=None):
     """
     Assign values using the single possibility strategy.
     See link for details: http://www.sudokudragon.com/sudokustrategy.htm
@@ -159,76 +242,695 @@ def single_possibility(values):
                     digits = digits.replace(values[peer],'')
         # Only one digit can go in this box i.e. a single possibility
         if len(digits) == 1:
-            values = assign_value(values, box, digits)
+            values = assign_value(values, box, digits, tracer)
     return values
 
-def reduce_puzzle(values):
+def hidden_pairs(values, tracer=None):
+    """Eliminate values using the hidden pairs strategy.
+
+    When two digits can only go in the same two boxes of a unit, those two
+    boxes can hold no other digit.
+    Args:
+        values(dict): a dictionary of the form {'box_name': '123456789', ...}
+        tracer(AssignmentTracer): optional record of the updates.
+    Returns:
+        The values dictionary with the other digits removed from hidden pairs.
+    """
+    for unit in unitlist:
+        # Group the digits that fit in exactly two boxes by those boxes
+        places = {}
+        for digit in '123456789':
+            dplaces = tuple(box for box in unit if digit in values[box])
+            if len(dplaces) == 2:
+                places.setdefault(dplaces, []).append(digit)
+        for dplaces, pair in places.items():
+            if len(pair) == 2:
+                for box in dplaces:
+                    assign_value(values, box, ''.join(d for d in values[box] if d in pair), tracer)
+    return values
+
+# For every unit, the other units sharing more than one box with it and the shared boxes
+unit_overlaps = [(unit, [(other, set(unit) & set(other)) for other in unitlist
+                         if other is not unit and len(set(unit) & set(other)) > 1])
+                 for unit in unitlist]
+
+def pointing_pairs(values, tracer=None):
+    """Eliminate values using pointing pairs and box/line reduction.
+
+    When every box of a unit that can hold a digit also belongs to a second
+    unit, the digit has to go in their intersection and can be removed from the
+    rest of the second unit. Starting from a square this is the pointing pairs
+    (or triples) strategy, starting from a row, column or diagonal it is the
+    box/line reduction.
+    Args:
+        values(dict): a dictionary of the form {'box_name': '123456789', ...}
+        tracer(AssignmentTracer): optional record of the updates.
+    Returns:
+        The values dictionary with the locked digits removed from the second units.
+    """
+    for unit, overlaps in unit_overlaps:
+        for digit in '123456789':
+            dplaces = [box for box in unit if digit in values[box]]
+            if not dplaces:
+                continue
+            for other, shared in overlaps:
+                if all(box in shared for box in dplaces):
+                    for box in other:
+                        if box not in shared and digit in values[box]:
+                            assign_value(values, box, values[box].replace(digit, ''), tracer)
+    return values
+
+def x_wing(values, tracer=None):
+    """Eliminate values using the X-Wing strategy.
+
+    When a digit can only go in the same two columns in each of two rows, it
+    takes two opposite corners of that rectangle, so it can be removed from the
+    rest of both columns. The same holds with rows and columns swapped.
+    Args:
+        values(dict): a dictionary of the form {'box_name': '123456789', ...}
+        tracer(AssignmentTracer): optional record of the updates.
+    Returns:
+        The values dictionary with the X-Wing digits removed.
+    """
+    for lines, crossing in ((row_units, column_units), (column_units, row_units)):
+        for digit in '123456789':
+            # Group the lines where the digit fits in exactly two places by those places
+            wings = {}
+            for line in lines:
+                positions = tuple(k for k, box in enumerate(line) if digit in values[box])
+                if len(positions) == 2:
+                    wings.setdefault(positions, []).append(line)
+            for positions, wing in wings.items():
+                if len(wing) == 2:
+                    corners = set(wing[0]) | set(wing[1])
+                    for k in positions:
+                        for box in crossing[k]:
+                            if box not in corners and digit in values[box]:
+                                assign_value(values, box, values[box].replace(digit, ''), tracer)
+    return values
+
+def candidate_count(values):
+    """Return the number of candidate digits left on the board."""
+    return sum(len(value) for value in values.values())
+
+class Strategy:
+    """
+    A propagation strategy of reduce_puzzle() and its running statistics.
+
+    Calling the strategy applies function(values, tracer=tracer) and returns
+    the number of candidate digits it removed. A disabled strategy is skipped.
+    """
+
+    def __init__(self, name, function, enabled=True):
+        self.name = name
+        self.function = function
+        self.enabled = enabled
+        self.calls = 0
+        self.eliminations = 0
+        self.seconds = 0.0
+
+    def __call__(self, values, tracer=None):
+        before = candidate_count(values)
+        start = timer()
+        self.function(values, tracer=tracer)
+        self.seconds += timer() - start
+        self.calls += 1
+        eliminated = before - candidate_count(values)
+        self.eliminations += eliminated
+        return eliminated
+
+    def __repr__(self):
+        return '{:<18} {:>6d} calls {:>7d} eliminations {:>9.2f} ms{}'.format(
+            self.name, self.calls, self.eliminations, self.seconds * 1000,
+            '' if self.enabled else ' (disabled)')
+
+# Strategies available to reduce_puzzle() by name
+strategy_functions = {
+    'eliminate': eliminate,
+    'only_choice': only_choice,
+    'single_possibility': single_possibility,
+    'hidden_pairs': hidden_pairs,
+    'pointing_pairs': pointing_pairs,
+    'x_wing': x_wing,
+}
+naked_subset_sizes = {'naked_twins': 2, 'naked_triples': 3, 'naked_quads': 4}
+strategy_names = tuple(strategy_functions) + tuple(naked_subset_sizes)
+
+# The strategies of reduce_puzzle() unless told otherwise, in order. The
+# others are opt-in: naked_twins saves about an eighth of the search nodes of
+# the diagonal corpus but costs as much time as it saves
+default_strategies = ('eliminate', 'only_choice')
+
+def make_strategy(name, enabled=True):
+    """Return a new Strategy for one of `strategy_names`."""
+    if name in naked_subset_sizes:
+        # Each strategy keeps its own record of the units it has seen unchanged
+        function = functools.partial(naked_subsets, size=naked_subset_sizes[name], seen={})
+    elif name in strategy_functions:
+        function = strategy_functions[name]
+    else:
+        raise ValueError('Unknown strategy: {}'.format(name))
+    return Strategy(name, function, enabled)
+
+def check_strategies(strategies):
+    """
+    Raise ValueError unless eliminate is among the enabled strategies. Only
+    eliminate removes the digit of a solved box from its peers; without it
+    search() would accept boards where peers share a digit.
+    """
+    if not any(strategy.name == 'eliminate' and strategy.enabled for strategy in strategies):
+        raise ValueError('The strategies need eliminate enabled')
+
+def make_strategies(strategies=default_strategies):
+    """
+    Return a list of Strategy objects from names or existing Strategy objects,
+    in order, or strategies itself if it is a StrategyScheduler.
+    Raises:
+        ValueError if eliminate is not among the enabled strategies.
+    """
+    if isinstance(strategies, StrategyScheduler):
+        return strategies
+    strategies = [make_strategy(s) if isinstance(s, str) else s for s in strategies]
+    check_strategies(strategies)
+    return strategies
+
+class StrategyScheduler:
+    """
+    Adaptive order of the strategies of reduce_puzzle().
+
+    Pass a scheduler to solve() instead of a list of strategies. Strategies run
+    cheapest first, by their measured time per call, and a strategy only runs
+    once every cheaper one has stalled on the board; as soon as one removes a
+    candidate the pass starts over from the cheapest. Strategies without
+    measurements yet run in the given order.
+
+    After warmup calls, a strategy removing fewer than min_yield candidates per
+    millisecond is skipped, except once every probe reductions so that it can
+    prove itself useful again. The required strategies are never skipped;
+    without 'eliminate' a board could end up with every box solved but in
+    conflict. The Strategy objects keep their statistics over every puzzle
+    the scheduler solves, so a scheduler shared by a corpus tunes itself to it
+    and report() shows how.
+    """
+
+    def __init__(self, strategies=strategy_names, min_yield=1.0, warmup=20, probe=100,
+                 required=('eliminate',)):
+        self.strategies = make_strategies(strategies)
+        self.min_yield = min_yield
+        self.warmup = warmup
+        self.probe = probe
+        self.required = required
+        self.reductions = 0
+        self.skips = dict((strategy.name, 0) for strategy in self.strategies)
+
+    def __iter__(self):
+        return iter(self.strategies)
+
+    def cost(self, strategy):
+        """Return the mean seconds per call of a strategy, 0 before its first call."""
+        return strategy.seconds / strategy.calls if strategy.calls else 0.0
+
+    def efficiency(self, strategy):
+        """Return the candidates a strategy removed per millisecond, None before warmup calls."""
+        if strategy.calls < self.warmup:
+            return None
+        return strategy.eliminations / max(strategy.seconds * 1000, 1e-9)
+
+    def skipped(self, strategy):
+        """Return True if a strategy yields too little for its time."""
+        efficiency = self.efficiency(strategy)
+        return (strategy.name not in self.required and efficiency is not None
+                and efficiency < self.min_yield)
+
+    def order(self):
+        """Return the enabled strategies to apply to the next board, cheapest first."""
+        probing = self.probe and self.reductions % self.probe == 0
+        active = []
+        for index, strategy in enumerate(self.strategies):
+            if not strategy.enabled:
+                continue
+            if not probing and self.skipped(strategy):
+                self.skips[strategy.name] += 1
+                continue
+            active.append((strategy.calls > 0, self.cost(strategy), index, strategy))
+        return [strategy for _, _, _, strategy in sorted(active)]
+
+    def reduce(self, values, tracer=None, profile=None, depth=0, stats=None):
+        """Propagate values like reduce_puzzle(). Returns the board, or False on a contradiction."""
+        check_strategies(self.strategies)
+        self.reductions += 1
+        order = self.order()
+        i = 0
+        while i < len(order):
+            if stats is not None:
+                stats.check()
+            if profile is None:
+                eliminated = order[i](values, tracer)
+            else:
+                eliminated = profile.run(order[i], values, tracer, depth)
+            if '' in values.values():
+                return False
+            # Cheaper strategies may have work again
+            i = 0 if eliminated else i + 1
+        return values
+
+    def report(self, out=sys.stdout):
+        """Print the statistics of every strategy in the current order."""
+        line = '{:<18} {:>7}  {:>10}  {:>12}  {:>10}  {:>7}\n'
+        out.write(line.format('name', 'calls', 'ms/call', 'eliminations', 'per ms', 'skips'))
+        for strategy in sorted(self.strategies, key=self.cost):
+            efficiency = strategy.eliminations / max(strategy.seconds * 1000, 1e-9)
+            out.write(line.format(strategy.name, strategy.calls, '{:.4f}'.format(self.cost(strategy) * 1000),
+                                  strategy.eliminations, '{:.1f}'.format(efficiency),
+                                  self.skips[strategy.name]))
+
+def solved_count(values):
+    """Return the number of boxes holding a single digit."""
+    return sum(len(value) == 1 for value in values.values())
+
+class ProfileCounters:
+    """Calls, wall time, eliminations and assignments of one strategy."""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.eliminations = 0
+        self.assignments = 0
+
+    def add(self, other):
+        self.calls += other.calls
+        self.seconds += other.seconds
+        self.eliminations += other.eliminations
+        self.assignments += other.assignments
+
+class Profile:
+    """
+    Counters of the 'dict' engine per strategy and per search depth.
+
+    Pass a Profile to solve() to find where the time of a puzzle goes. Each
+    strategy call of reduce_puzzle() adds its wall time, the candidates it
+    removed and the boxes it solved under the strategy name and the depth of
+    the search node. Branching is counted as 'branch': one call per node
+    that branches, the time spent choosing the box and ordering its digits,
+    and one assignment per digit tried. Without a Profile nothing is measured.
     """
-    Iterate eliminate() and only_choice(). If at some point, there is a box with no available values, return False.
+
+    BRANCH = 'branch'
+
+    def __init__(self):
+        # depth -> name -> ProfileCounters
+        self.depths = {}
+
+    def counters(self, depth, name):
+        """Return the counters of a name at a search depth, creating them if needed."""
+        by_name = self.depths.setdefault(depth, {})
+        if name not in by_name:
+            by_name[name] = ProfileCounters()
+        return by_name[name]
+
+    def run(self, strategy, values, tracer, depth):
+        """Apply a Strategy to values, counting it at depth. Returns its eliminations."""
+        solved = solved_count(values)
+        start = timer()
+        eliminated = strategy(values, tracer)
+        counters = self.counters(depth, strategy.name)
+        counters.seconds += timer() - start
+        counters.calls += 1
+        counters.eliminations += eliminated
+        counters.assignments += solved_count(values) - solved
+        return eliminated
+
+    def totals(self):
+        """Return the counters of every name summed over the depths."""
+        totals = {}
+        for by_name in self.depths.values():
+            for name, counters in by_name.items():
+                totals.setdefault(name, ProfileCounters()).add(counters)
+        return totals
+
+    def report(self, out=sys.stdout):
+        """Print the totals per name, then the counters per depth."""
+        line = '{:>5}  {:<18} {:>7}  {:>10}  {:>12}  {:>11}\n'
+        out.write(line.format('depth', 'name', 'calls', 'ms', 'eliminations', 'assignments'))
+        rows = [('all', self.totals())] + sorted(self.depths.items())
+        for depth, by_name in rows:
+            for name, c in sorted(by_name.items()):
+                out.write(line.format(depth, name, c.calls, '{:.3f}'.format(c.seconds * 1000),
+                                      c.eliminations, c.assignments))
+
+class BudgetExhausted(Exception):
+    """Raised by SearchStats.visit() once the search runs out of nodes or time."""
+
+
+class SearchStats:
+    """
+    Counters of a solve: search nodes visited and propagation rounds run.
+    Used by the dictionary engine here and the engines of bitboard.py.
+
+    With a deadline in milliseconds from now or a maximum number of nodes, the
+    search raises BudgetExhausted instead of entering a node past either limit.
+    The deadline is also checked between propagation rounds, so the search
+    overruns it by one round at most.
+
+    board is the board at the root of the search, propagated as far as the
+    search got before it finished or gave up. Every candidate it rules out is
+    ruled out in every solution.
+    """
+
+    def __init__(self, deadline_ms=None, max_nodes=None):
+        self.nodes = 0
+        self.rounds = 0
+        self.deadline = None if deadline_ms is None else timer() + deadline_ms / 1000.0
+        self.max_nodes = max_nodes
+        self.board = None
+
+    def check(self):
+        """Raise BudgetExhausted if the deadline has passed."""
+        if self.deadline is not None and timer() > self.deadline:
+            raise BudgetExhausted('Deadline passed after {} search nodes'.format(self.nodes))
+
+    def visit(self):
+        """Count a search node, unless it is past the budget."""
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            raise BudgetExhausted('Used all {} search nodes'.format(self.max_nodes))
+        self.check()
+        self.nodes += 1
+
+def reduce_puzzle(values, tracer=None, strategies=None, profile=None, depth=0, stats=None):
+    """
+    Apply the strategies in order until a full pass solves no more boxes. If at some point, there is a box with no available values, return False.
     If the sudoku is solved, return the sudoku.
-    If after an iteration of both functions, the sudoku remains the same, return the sudoku.
     Args:
-        A sudoku in dictionary form.
+        A sudoku in dictionary form, an optional AssignmentTracer and the
+        Strategy objects to apply, see make_strategies(). Defaults to eliminate
+        and only_choice. An optional Profile counts every strategy
+        call under the search depth. A StrategyScheduler in place of the
+        strategies chooses their order itself. An optional SearchStats
+        counts one round per pass and has its deadline checked before every
+        strategy call.
     Returns:
         The resulting sudoku in dictionary form.
+    Raises:
+        ValueError if eliminate is not among the enabled strategies.
+        BudgetExhausted once the deadline of stats has passed; the
+        board is then reduced as far as the strategies got.
     """
+    if strategies is None:
+        strategies = make_strategies()
+    if isinstance(strategies, StrategyScheduler):
+        return strategies.reduce(values, tracer, profile, depth, stats)
+    # A strategy may have been disabled since make_strategies()
+    check_strategies(strategies)
     stalled = False
     while not stalled:
-        solved_values_before = len([box for box in values.keys() if len(values[box]) == 1])
-        # Apply the eliminate exclusion strategy
-        values = eliminate(values)
-        # Apply the only choice assignment strategy
-        values = only_choice(values)
-        solved_values_after = len([box for box in values.keys() if len(values[box]) == 1])
+        if stats is not None:
+            stats.rounds += 1
+        solved_values_before = solved_count(values)
+        for strategy in strategies:
+            if strategy.enabled:
+                if stats is not None:
+                    stats.check()
+                if profile is None:
+                    strategy(values, tracer)
+                else:
+                    profile.run(strategy, values, tracer, depth)
+                # Sanity check: never eliminate all digits from a box's possibilities
+                if '' in values.values():
+                    return False
         # Stop applying these strategies if we stop making box-solving progress
-        stalled = solved_values_before == solved_values_after
-        # Sanity check: never eliminate all digits from a box's possibilities
-        if len([box for box in values.keys() if len(values[box]) == 0]):
-            return False
+        stalled = solved_values_before == solved_count(values)
     return values
 
-def search(values):
+class Branching:
+    """
+    Branching policy of search(): which box to branch on and in which order to
+    try its digits. Counts the search nodes it was asked about.
+
+    The box is the unfilled box with the fewest candidates (MRV). With degree,
+    ties go to the box with the most unfilled peers, which constrains the rest
+    of the board the most. With lcv, digits are tried starting with the one
+    left in the fewest peers, which rules out the fewest options elsewhere.
+    """
+
+    # Whether the policy must see every board update, see TracerGroup
+    incremental = False
+
+    def __init__(self, degree=False, lcv=False):
+        self.degree = degree
+        self.lcv = lcv
+        self.nodes = 0
+
+    def choose_box(self, values):
+        """Return the box to branch on, None if the board is solved."""
+        unfilled = [s for s in boxes if len(values[s]) > 1]
+        if not unfilled:
+            return None
+        n = min(len(values[s]) for s in unfilled)
+        fewest = [s for s in unfilled if len(values[s]) == n]
+        if self.degree and len(fewest) > 1:
+            return max(fewest, key=lambda s: sum(1 for p in peers[s] if len(values[p]) > 1))
+        return fewest[0]
+
+    def order_values(self, values, box):
+        """Return the digits of box in the order to try them."""
+        if not self.lcv:
+            return values[box]
+        return sorted(values[box], key=lambda d: sum(1 for p in peers[box] if d in values[p]))
+
+class BucketBranching(Branching):
+    """
+    MRV branching on buckets of unfilled boxes keyed by their number of candidates.
+
+    Instead of rescanning the 81 boxes at every node, the buckets are updated
+    from the (box, old, new) records of every board update, so the policy has
+    to receive them like an AssignmentTracer; solve() takes care of that.
+    """
+
+    incremental = True
+
+    def __init__(self, lcv=False):
+        Branching.__init__(self, lcv=lcv)
+        self.buckets = {}
+
+    def start(self, values):
+        """Fill the buckets from the given board."""
+        self.buckets = dict((n, set()) for n in range(2, 10))
+        for box, value in values.items():
+            if len(value) > 1:
+                self.buckets[len(value)].add(box)
+
+    def record(self, box, old, new):
+        """Move box to the bucket of its new number of candidates."""
+        if len(old) > 1:
+            self.buckets[len(old)].discard(box)
+        if len(new) > 1:
+            self.buckets[len(new)].add(box)
+
+    def choose_box(self, values):
+        for n in range(2, 10):
+            if self.buckets[n]:
+                # min keeps the choice independent of the set iteration order
+                return min(self.buckets[n])
+        return None
+
+class TracerGroup:
+    """Forwards the board updates of a solve to several tracers."""
+
+    def __init__(self, *tracers):
+        self.tracers = tracers
+
+    def record(self, box, old, new):
+        for tracer in self.tracers:
+            tracer.record(box, old, new)
+
+# Branching policies of search() by name
+branching_policies = {
+    'mrv': lambda: Branching(),
+    'mrv_degree': lambda: Branching(degree=True),
+    'mrv_lcv': lambda: Branching(lcv=True),
+    'mrv_degree_lcv': lambda: Branching(degree=True, lcv=True),
+    'buckets': lambda: BucketBranching(),
+}
+
+def make_branching(branching='mrv'):
+    """Return a new policy for one of `branching_policies`, or branching itself if it is a policy."""
+    if isinstance(branching, Branching):
+        return branching
+    if branching not in branching_policies:
+        raise ValueError('Unknown branching policy: {}'.format(branching))
+    return branching_policies[branching]()
+
+def search(values, tracer=None, strategies=None, branching=None, profile=None, depth=0, stats=None):
     """
     Using depth-first search and propagation, try all possible values.
     Args:
-        A sudoku in dictionary form.
+        A sudoku in dictionary form, an optional AssignmentTracer, the
+        strategies of reduce_puzzle() and the Branching policy, both shared by
+        every node of the search. An incremental policy must also be part of
+        the tracer, see solve(). An optional Profile and the depth of this node.
+        An optional SearchStats whose budget every node checks; it
+        keeps the board of the root node, reduced in place.
     Returns:
         The solved sudoku if solvable or False if not solvable.
     """
+    if strategies is None:
+        strategies = make_strategies()
+    if branching is None:
+        branching = Branching()
+    branching.nodes += 1
+    if stats is not None:
+        if depth == 0:
+            # Children are searched on copies, so this stays the root board
+            stats.board = values
+        stats.visit()
     # First, reduce the puzzle using the previous function
-    values = reduce_puzzle(values)
+    values = reduce_puzzle(values, tracer, strategies, profile, depth, stats)
     if values is False:
         return False  # Failed earlier
-    if all(len(values[s]) == 1 for s in boxes):
-        return values  # Solved!
+    if profile is not None:
+        start = timer()
     # Choose one of the unfilled squares with the fewest possibilities
-    n,s = min((len(values[s]), s) for s in boxes if len(values[s]) > 1)
+    s = branching.choose_box(values)
+    if s is None:
+        return values  # Solved!
+    order = branching.order_values(values, s)
+    if profile is not None:
+        counters = profile.counters(depth, Profile.BRANCH)
+        counters.calls += 1
+        counters.seconds += timer() - start
     # Now use recurrence to solve each one of the resulting sudokus,
     # and if one returns a value (not False), return that answer!
-    for value in values[s]:
+    for value in order:
         new_sudoku = values.copy()
-        new_sudoku[s] = value
-        attempt = search(new_sudoku)
+        assign_value(new_sudoku, s, value, tracer)
+        if profile is not None:
+            counters.assignments += 1
+        attempt = search(new_sudoku, tracer, strategies, branching, profile, depth + 1, stats)
         if attempt:
             return attempt
+        if tracer is not None:
+            # Record the backtrack so that replaying the diffs restores this board
+            for box in boxes:
+                if new_sudoku[box] != values[box]:
+                    tracer.record(box, new_sudoku[box], values[box])
 
             
 def is_solved(values):
     """Return true if sudoku is solved, false otherwise"""
     return all(len(values[box]) == 1 for box in values.keys())
 
-def solve(grid):
+class SolveResult:
+    """
+    Outcome of a solve within a budget, see solve().
+
+    status is SOLVED, UNSOLVABLE or TIMEOUT. values is the solution once
+    solved and False if there is none. On timeout it is the puzzle as far as
+    the search propagated it before branching, which is not all the way when
+    the budget ran out first, so every digit it rules out is ruled out in
+    every solution. nodes counts the search nodes entered and
+    seconds the time spent.
+    """
+
+    SOLVED = 'solved'
+    UNSOLVABLE = 'unsolvable'
+    TIMEOUT = 'timeout'
+
+    def __init__(self, status, values, nodes, seconds):
+        self.status = status
+        self.values = values
+        self.nodes = nodes
+        self.seconds = seconds
+
+    def __repr__(self):
+        return 'SolveResult({}, {} nodes, {:.2f} ms)'.format(self.status, self.nodes, self.seconds * 1000)
+
+def solve(grid, engine='dict', tracer=None, strategies=None, branching='mrv', profile=None, cache=None,
+          workers=1, deadline_ms=None, max_nodes=None):
     """
     Find the solution to a Sudoku grid.
     Args:
         grid(string): a string representing a sudoku grid.
             Example: '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+        engine(string): 'dict' solves on the dictionary board of this module,
+            'bits' on the bitmask board of bitboard.py with full-board sweeps,
+            'queue' on the bitmask board with incremental propagation and
+            'trail' like 'queue' but backtracking on one board with an undo trail
+            'dlx' as an exact cover problem with dancing links (dlx.py) and
+            'sat' as a CNF formula with the CDCL solver of sat.py.
+        tracer(AssignmentTracer): if given, records every update of the 'dict'
+            engine. The other engines record nothing.
+        strategies(list): propagation strategies of the 'dict' engine, names from
+            `strategy_names` or Strategy objects, which collect their calls,
+            eliminations and time. Defaults to `default_strategies`.
+        branching: branching policy of the 'dict' engine, a name from
+            `branching_policies` or a Branching object, which counts the nodes.
+        profile(Profile): if given, counts the strategies and branching of the
+            'dict' engine per search depth.
+        cache(SolutionCache): if given, answers puzzles equivalent to one
+            solved before from canonical.py's cache; on a miss the engine
+            solves the canonical form of the puzzle.
+        workers(int): with more than one, the 'dict', 'bits', 'queue' and
+            'trail' engines split the search of the puzzle across that many
+            processes, see parallel.py. No tracer or profile then.
+        deadline_ms(float): if given, give up once the search is still running
+            this many milliseconds after the call. The deadline is checked
+            between search nodes and between propagation rounds, so the
+            search stops within one strategy call or round of it.
+        max_nodes(int): if given, give up before entering more search nodes.
+            Either budget makes solve() return a SolveResult instead; they
+            apply to the 'dict', 'bits', 'queue' and 'trail' engines, without
+            a cache or workers.
     Returns:
         The dictionary representation of the final sudoku grid. False if no solution exists.
     """
+    if deadline_ms is not None or max_nodes is not None:
+        if cache is not None or workers > 1:
+            raise ValueError('A search budget cannot be combined with a cache or workers')
+        return solve_within(grid, engine, deadline_ms, max_nodes, tracer, strategies, branching, profile)
+    if cache is not None:
+        return cache.solve(grid, functools.partial(solve, engine=engine, tracer=tracer, strategies=strategies,
+                                                   branching=branching, profile=profile, workers=workers))
+    if workers > 1 and (tracer is not None or profile is not None):
+        raise ValueError('A tracer or profile cannot follow a search split across processes')
+    # The other engines are imported on first use, so that importing this
+    # module loads neither them nor multiprocessing
+    if engine in ('bits', 'queue', 'trail'):
+        import bitboard
+        propagation = 'sweep' if engine == 'bits' else engine
+        if workers > 1:
+            import parallel
+            solved = parallel.solve_cells(bitboard.grid_masks(grid), workers, propagation)
+            return bitboard.to_values(solved) if solved else False
+        return bitboard.solve(grid, propagation)
+    if engine == 'dlx':
+        import dlx
+        return dlx.solve(grid)
+    if engine == 'sat':
+        import sat
+        return sat.solve(grid)
+    if engine != 'dict':
+        raise ValueError('Unknown engine: {}'.format(engine))
     # Convert string grid to dictionary grid
     values = grid_values(grid)
-    solved = search(values)
+    if workers > 1:
+        import parallel
+        return parallel.solve_values(values, workers, strategies, branching)
+    if tracer is not None:
+        tracer.start(values)
+    return solve_values(values, tracer, strategies, branching, profile)
+
+def solve_values(values, tracer=None, strategies=None, branching='mrv', profile=None, stats=None):
+    """
+    Search a sudoku in dictionary form with the 'dict' engine, see solve().
+    Returns:
+        The dictionary representation of the final sudoku grid. False if no solution exists.
+    """
+    branching = make_branching(branching)
+    if branching.incremental:
+        branching.start(values)
+        tracer = branching if tracer is None else TracerGroup(tracer, branching)
+    solved = search(values, tracer, make_strategies(strategies or default_strategies), branching, profile,
+                    stats=stats)
     if solved:
         return solved
     else:
@@ -236,15 +938,150 @@ def solve(grid):
     
     
 
-if __name__ == '__main__':
-    diag_sudoku_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
-    display(solve(diag_sudoku_grid))
-
+def solve_within(grid, engine='dict', deadline_ms=None, max_nodes=None, tracer=None, strategies=None,
+                 branching='mrv', profile=None):
+    """
+    Solve a grid within a deadline and a number of search nodes, see solve().
+    Returns:
+        A SolveResult.
+    """
+    start = timer()
+    stats = SearchStats(deadline_ms, max_nodes)
+    bitmask = engine in ('bits', 'queue', 'trail')
+    if not bitmask and engine != 'dict':
+        raise ValueError('Only the dict and bitmask engines take a search budget, not {}'.format(engine))
+    if bitmask:
+        import bitboard
     try:
-        from visualize import visualize_assignments
-        visualize_assignments(assignments)
+        if bitmask:
+            solved = bitboard.solve_cells(bitboard.grid_masks(grid), 'sweep' if engine == 'bits' else engine,
+                                          stats=stats)
+            solved = bitboard.to_values(solved) if solved else False
+        else:
+            values = grid_values(grid)
+            if tracer is not None:
+                tracer.start(values)
+            solved = solve_values(values, tracer, strategies, branching, profile, stats)
+    except BudgetExhausted:
+        # The root board, as far as the search propagated it
+        board = stats.board
+        if bitmask:
+            board = bitboard.to_values(board)
+        return SolveResult(SolveResult.TIMEOUT, board, stats.nodes, timer() - start)
+    status = SolveResult.SOLVED if solved else SolveResult.UNSOLVABLE
+    return SolveResult(status, solved, stats.nodes, timer() - start)
+
+def count_solutions(grid, limit=2, engine='queue'):
+    """
+    Count the solutions of a Sudoku grid, stopping as soon as limit are found.
+    Args:
+        grid(string): a string representing a sudoku grid.
+        limit(int): maximum number of solutions to count, None for all of them.
+            With the default of 2 the result tells unsolvable (0), unique (1)
+            and ambiguous (2) puzzles apart at about the cost of one solve.
+        engine(string): 'queue' for the bitmask trail search, 'dlx' for dancing
+            links and 'sat' for the SAT solver, which keeps what it learnt
+            about one solution when looking for the next.
+    Returns:
+        The number of solutions, at most limit.
+    """
+    if engine == 'queue':
+        import bitboard
+        return bitboard.count_solutions(grid, limit)
+    if engine == 'dlx':
+        import dlx
+        return dlx.count_solutions(grid, limit)
+    if engine == 'sat':
+        import sat
+        return sat.count_solutions(grid, limit)
+    raise ValueError('Unknown engine: {}'.format(engine))
+
+
+def iter_solutions(grid, limit=None):
+    """
+    Generate the solutions of a Sudoku grid one at a time.
+    Args:
+        grid(string): a string representing a sudoku grid.
+        limit(int): stop after this many solutions, None for all of them.
+    Returns:
+        A generator of solved 81 character grid strings. The bitmask trail
+        search behind it keeps one board and the branches of the current
+        path, so enumerating millions of solutions takes no more memory than
+        the first.
+    """
+    import bitboard
+    return bitboard.iter_solutions(grid, limit)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve diagonal sudokus with the dictionary engine.")
+    parser.add_argument('grids', nargs='*',
+                        help="puzzles of 81 characters, defaults to the example puzzle")
+    parser.add_argument('-f', '--file', type=argparse.FileType('r'),
+                        help="also solve the puzzles of this file, one per line")
+    parser.add_argument('-s', '--strategies', nargs='+', choices=strategy_names,
+                        default=list(default_strategies),
+                        help="propagation strategies in order (default %(default)s)")
+    parser.add_argument('-b', '--branching', choices=sorted(branching_policies), default='mrv',
+                        help="branching policy (default mrv)")
+    parser.add_argument('--profile', action='store_true',
+                        help="print the strategy and branching breakdown of every puzzle")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="order and skip the strategies by their cost and yield, and print "
+                             "their statistics over all the puzzles")
+    args = parser.parse_args(argv)
+    if 'eliminate' not in args.strategies:
+        parser.error('the strategies must include eliminate')
+
+    # Puzzle files may start with '#' comment lines, like the corpora
+    grids = args.grids + ([line.strip() for line in args.file
+                           if line.strip() and not line.startswith('#')] if args.file else [])
+    strategies = StrategyScheduler(args.strategies) if args.adaptive else args.strategies
+    if args.adaptive and not args.profile:
+        start = timer()
+        solved = sum(1 for grid in grids or [diag_sudoku_grid]
+                     if solve(grid, strategies=strategies, branching=args.branching))
+        print('{} of {} puzzles solved in {:.2f} ms'.format(solved, len(grids) or 1, (timer() - start) * 1000))
+        strategies.report()
+        return
+    if not args.profile:
+        for grid in grids or [diag_sudoku_grid]:
+            tracer = AssignmentTracer()
+            solved = solve(grid, tracer=tracer, strategies=args.strategies, branching=args.branching)
+            if len(grids) > 1:
+                print(grid)
+            if solved:
+                display(solved)
+            else:
+                print('No solution')
+            if len(grids) > 1:
+                print()
+        # The visualization replays the assignments of a single puzzle
+        if len(grids) > 1:
+            return
+        try:
+            from visualize import visualize_assignments
+            visualize_assignments(tracer)
 
-    except SystemExit:
-        pass
-    except:
-        print('We could not visualize your board due to a pygame issue. Not a problem! It is not a requirement.')
+        except SystemExit:
+            pass
+        except:
+            print('We could not visualize your board due to a pygame issue. Not a problem! It is not a requirement.')
+        return
+
+    for grid in grids or [diag_sudoku_grid]:
+        profile = Profile()
+        start = timer()
+        solved = solve(grid, strategies=strategies, branching=args.branching, profile=profile)
+        print('{} {} in {:.2f} ms'.format(grid, 'solved' if solved else 'unsolvable',
+                                          (timer() - start) * 1000))
+        profile.report()
+        print()
+    if args.adaptive:
+        strategies.report()
+
+
+diag_sudoku_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,14 @@
+import bitboard
+import contextlib
+import io
+import os
+import shutil
 import solution
+import subprocess
+import sys
+import tempfile
+import testdata
+import tracemalloc
 import unittest
 
 
@@ -77,8 +87,200 @@ class TestNakedTwins(unittest.TestCase):
 
 
 
+class TestNakedSubsets(unittest.TestCase):
+
+    def test_naked_twins_counts_eliminations(self):
+        values = testdata.empty_board()
+        values['E1'] = values['E2'] = '12'
+        # 7 other boxes in row E and 6 more in the middle left square lose two digits
+        self.assertEqual(solution.naked_subsets(values, 2), 26)
+        self.assertEqual(values['E9'], '3456789')
+        self.assertEqual(values['D3'], '3456789')
+        self.assertEqual(values['E1'], '12')
+
+    def test_naked_triples(self):
+        values = testdata.empty_board()
+        values['E4'], values['E5'], values['E6'] = '12', '23', '13'
+        solution.naked_subsets(values, 3)
+        self.assertEqual(values['E9'], '456789')
+        self.assertEqual(values['D5'], '456789')
+        self.assertEqual(values['A5'], '123456789')
+
+    def test_unchanged_units_are_skipped(self):
+        values = testdata.empty_board()
+        values['E1'] = values['E2'] = '12'
+        seen = {}
+        self.assertEqual(solution.naked_subsets(values, 2, seen), 26)
+        # Row E and the middle left square changed and are checked again
+        self.assertEqual(len(seen), len(solution.unitlist) - 2)
+        self.assertEqual(solution.naked_subsets(values, 2, seen), 0)
+        self.assertEqual(len(seen), len(solution.unitlist))
+
+
+class TestStrategies(unittest.TestCase):
+
+    def remove(self, values, digits, boxes):
+        for box in boxes:
+            values[box] = ''.join(d for d in values[box] if d not in digits)
+
+    def test_hidden_pairs(self):
+        values = testdata.empty_board()
+        self.remove(values, '12', solution.cross('A', '3456789'))
+        solution.hidden_pairs(values)
+        self.assertEqual((values['A1'], values['A2']), ('12', '12'))
+        self.assertEqual(values['B1'], '123456789')
+
+    def test_pointing_pairs(self):
+        values = testdata.empty_board()
+        self.remove(values, '1', ['A3'] + solution.cross('BC', '123'))
+        solution.pointing_pairs(values)
+        self.assertEqual(values['A9'], '23456789')
+        self.assertEqual(values['A1'], '123456789')
+        self.assertEqual(values['D1'], '123456789')
+
+    def test_x_wing(self):
+        values = testdata.empty_board()
+        self.remove(values, '1', solution.cross('AE', '2346789'))
+        solution.x_wing(values)
+        self.assertEqual(values['C1'], '23456789')
+        self.assertEqual(values['I5'], '23456789')
+        self.assertEqual(values['A1'], '123456789')
+        self.assertEqual(values['C2'], '123456789')
+
+    def test_pipeline_order_toggles_and_stats(self):
+        strategies = solution.make_strategies(['eliminate', 'only_choice', 'x_wing', 'hidden_pairs'])
+        strategies[2].enabled = False
+        grid = testdata.hard_grid
+        self.assertEqual(solution.solve(grid, strategies=strategies), solution.solve(grid, engine='dlx'))
+        self.assertEqual([s.name for s in strategies], ['eliminate', 'only_choice', 'x_wing', 'hidden_pairs'])
+        self.assertEqual(strategies[2].calls, 0)
+        self.assertGreater(strategies[0].eliminations, 0)
+        self.assertGreater(strategies[3].calls, 0)
+        self.assertRaises(ValueError, solution.make_strategy, 'guess')
+
+    def test_pipeline_needs_eliminate(self):
+        grid = solution.diag_sudoku_grid
+        self.assertRaises(ValueError, solution.solve, grid, strategies=['only_choice'])
+        strategies = solution.make_strategies()
+        strategies[0].enabled = False
+        self.assertRaises(ValueError, solution.solve, grid, strategies=strategies)
+        self.assertRaises(ValueError, solution.StrategyScheduler, ['only_choice'])
+        scheduler = solution.StrategyScheduler()
+        scheduler.strategies[0].enabled = False
+        self.assertRaises(ValueError, solution.solve, grid, strategies=scheduler)
+        self.assertRaises(SystemExit, solution.main, ['-s', 'only_choice'])
+
+
+class TestBranching(unittest.TestCase):
+    hard_grid = testdata.hard_grid
+    unique_grid = testdata.unique_grid
+
+    def is_solution(self, values, grid):
+        return (all(sorted(values[box] for box in unit) == list('123456789') for unit in solution.unitlist)
+                and all(values[box] == c for box, c in zip(solution.boxes, grid) if c != '.'))
+
+    def test_policies_solve_and_count_nodes(self):
+        for name in solution.branching_policies:
+            branching = solution.make_branching(name)
+            self.assertTrue(self.is_solution(solution.solve(self.hard_grid, branching=branching), self.hard_grid))
+            self.assertGreater(branching.nodes, 1)
+
+    def test_buckets_follow_mrv(self):
+        mrv, buckets = solution.Branching(), solution.BucketBranching()
+        self.assertEqual(solution.solve(self.hard_grid, branching=mrv),
+                         solution.solve(self.hard_grid, branching=buckets))
+        self.assertEqual(mrv.nodes, buckets.nodes)
+
+    def test_least_constraining_value(self):
+        branching = solution.make_branching('mrv_lcv')
+        self.assertEqual(solution.solve(self.unique_grid, branching=branching),
+                         solution.solve(self.unique_grid, engine='dlx'))
+        self.assertLess(branching.nodes, 100)
+        self.assertRaises(ValueError, solution.make_branching, 'random')
+
+
+class TestProfile(unittest.TestCase):
+    unique_grid = testdata.unique_grid
+
+    def test_counts_per_strategy_and_depth(self):
+        profile = solution.Profile()
+        branching = solution.make_branching('mrv_lcv')
+        solved = solution.solve(self.unique_grid, branching=branching, profile=profile)
+        self.assertEqual(solved, solution.solve(self.unique_grid, engine='dlx'))
+        totals = profile.totals()
+        self.assertEqual(set(totals), set(solution.default_strategies) | {solution.Profile.BRANCH})
+        self.assertEqual(sorted(profile.depths), list(range(max(profile.depths) + 1)))
+        branch = totals[solution.Profile.BRANCH]
+        self.assertEqual(branch.assignments, branching.nodes - 1)
+        # Every box is solved by a strategy, a branch or was given
+        givens = sum(c != '.' for c in self.unique_grid)
+        solved_by_strategies = sum(c.assignments for name, c in totals.items()
+                                   if name != solution.Profile.BRANCH)
+        self.assertGreaterEqual(givens + solved_by_strategies + branch.assignments, 81)
+        self.assertGreater(totals['eliminate'].eliminations, 0)
+
+    def test_report(self):
+        out = io.StringIO()
+        profile = solution.Profile()
+        solution.solve(self.unique_grid, branching='mrv_lcv', profile=profile)
+        profile.report(out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[1].split()[:2], ['all', 'branch'])
+        self.assertIn('only_choice', out.getvalue())
+
+    def test_main_skips_comment_lines(self):
+        path = os.path.join(tempfile.mkdtemp(), 'puzzles.txt')
+        try:
+            with open(path, 'w') as f:
+                f.write('# A corpus header\n\n{}\n'.format(solution.diag_sudoku_grid))
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                solution.main(['--profile', '-f', path])
+            self.assertEqual(out.getvalue().count(' solved in '), 1)
+        finally:
+            shutil.rmtree(os.path.dirname(path))
+
+    def test_main_displays_every_grid(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            solution.main([solution.diag_sudoku_grid, '11' + '.' * 79])
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], solution.diag_sudoku_grid)
+        self.assertEqual(lines[-3:], ['11' + '.' * 79, 'No solution', ''])
+
+
+class TestStrategyScheduler(unittest.TestCase):
+    unique_grid = testdata.unique_grid
+
+    def test_order_and_skips(self):
+        scheduler = solution.StrategyScheduler(['eliminate', 'single_possibility', 'only_choice'], warmup=2)
+        eliminate, single, only = scheduler.strategies
+        # Unmeasured strategies run in the given order
+        self.assertEqual(scheduler.order(), [eliminate, single, only])
+        for strategy, seconds, eliminations in ((eliminate, 0.002, 40), (single, 0.02, 0), (only, 0.004, 8)):
+            strategy.calls, strategy.seconds, strategy.eliminations = 2, seconds, eliminations
+        scheduler.reductions = 1
+        self.assertEqual(scheduler.order(), [eliminate, only])
+        self.assertEqual(scheduler.skips['single_possibility'], 1)
+        # Probed once every probe reductions, required strategies are never skipped
+        scheduler.reductions = scheduler.probe
+        eliminate.eliminations = 0
+        self.assertEqual(scheduler.order(), [eliminate, only, single])
+
+    def test_solves_and_learns(self):
+        scheduler = solution.StrategyScheduler(warmup=5)
+        expected = solution.solve(self.unique_grid, engine='dlx')
+        self.assertEqual(solution.solve(self.unique_grid, strategies=scheduler), expected)
+        self.assertEqual(solution.solve(self.unique_grid, strategies=scheduler), expected)
+        self.assertGreater(scheduler.skips['single_possibility'], 0)
+        self.assertEqual(scheduler.skips['eliminate'], 0)
+        out = io.StringIO()
+        scheduler.report(out)
+        self.assertEqual(len(out.getvalue().splitlines()), len(solution.strategy_names) + 1)
+
+
 class TestDiagonalSudoku(unittest.TestCase):
-    diagonal_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+    diagonal_grid = testdata.diagonal_grid
     solved_diag_sudoku = {'G7': '8', 'G6': '9', 'G5': '7', 'G4': '3', 'G3': '2', 'G2': '4', 'G1': '6', 'G9': '5',
                           'G8': '1', 'C9': '6', 'C8': '7', 'C3': '1', 'C2': '9', 'C1': '4', 'C7': '5', 'C6': '3',
                           'C5': '2', 'C4': '8', 'E5': '9', 'E4': '1', 'F1': '1', 'F2': '2', 'F3': '9', 'F4': '6',
@@ -94,5 +296,147 @@ class TestDiagonalSudoku(unittest.TestCase):
     def test_solve(self):
         self.assertEqual(solution.solve(self.diagonal_grid), self.solved_diag_sudoku)
 
+    def test_import_loads_no_other_engine(self):
+        # The project is submitted as solution.py alone
+        code = 'import solution, sys; print(sorted({"bitboard", "multiprocessing", "parallel"} & set(sys.modules)))'
+        out = subprocess.check_output([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(out.strip(), b'[]')
+
+    def test_budget_without_other_modules(self):
+        # solution.py copied alone, with bitboard unimportable
+        code = ('import sys; sys.modules["bitboard"] = None; import solution; '
+                'print(solution.solve({!r}, deadline_ms=10000).status)'.format(self.diagonal_grid))
+        directory = tempfile.mkdtemp()
+        try:
+            shutil.copy(solution.__file__, directory)
+            env = dict((k, v) for k, v in os.environ.items() if k != 'PYTHONPATH')
+            out = subprocess.check_output([sys.executable, '-c', code], cwd=directory, env=env)
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(out.strip(), solution.SolveResult.SOLVED.encode())
+
+class TestCountSolutions(unittest.TestCase):
+    diagonal_grid = TestDiagonalSudoku.diagonal_grid
+
+    def test_unique_ambiguous_unsolvable(self):
+        for engine in ('queue', 'dlx'):
+            self.assertEqual(solution.count_solutions(self.diagonal_grid, engine=engine), 1)
+            self.assertEqual(solution.count_solutions('.' * 81, engine=engine), 2)
+            self.assertEqual(solution.count_solutions('11' + '.' * 79, engine=engine), 0)
+
+    def test_limit(self):
+        self.assertEqual(solution.count_solutions('.' * 81, limit=25), 25)
+        # Removing one given leaves the diagonal example with many solutions
+        grid = '.' + self.diagonal_grid[1:]
+        self.assertEqual(solution.count_solutions(grid, limit=None),
+                         solution.count_solutions(grid, limit=None, engine='dlx'))
+
+
+class TestIterSolutions(unittest.TestCase):
+    diagonal_grid = TestDiagonalSudoku.diagonal_grid
+
+    def assertSolves(self, solved, grid):
+        self.assertTrue(all(g in '.' + s for g, s in zip(grid, solved)))
+        values = dict(zip(solution.boxes, solved))
+        for unit in solution.unitlist:
+            self.assertEqual(sorted(values[box] for box in unit), list('123456789'))
+
+    def test_all_solutions(self):
+        self.assertEqual(list(solution.iter_solutions(self.diagonal_grid)),
+                         [''.join(solution.solve(self.diagonal_grid)[box] for box in solution.boxes)])
+        self.assertEqual(list(solution.iter_solutions('11' + '.' * 79)), [])
+        grid = '.' * 3 + self.diagonal_grid[3:18] + '.' * 3 + self.diagonal_grid[21:]
+        solutions = list(solution.iter_solutions(grid))
+        self.assertEqual(len(set(solutions)), solution.count_solutions(grid, limit=None, engine='dlx'))
+        for solved in solutions:
+            self.assertSolves(solved, grid)
+
+    def test_lazy_and_bounded(self):
+        solutions = solution.iter_solutions('.' * 81, limit=200)
+        first = next(solutions)
+        rest = list(solutions)
+        self.assertEqual(len(set([first] + rest)), 200)
+        self.assertSolves(rest[-1], '.' * 81)
+        # The memory of the search does not grow with the solutions enumerated
+        peaks = []
+        for limit in (100, 1000):
+            tracemalloc.start()
+            for _ in solution.iter_solutions('.' * 81, limit):
+                pass
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        self.assertLess(peaks[1], peaks[0] * 1.5)
+
+
+class TestSearchBudget(unittest.TestCase):
+    unique_grid = testdata.unique_grid
+
+    def test_node_limit(self):
+        expected = solution.solve(self.unique_grid, engine='dlx')
+        for engine in ('dict', 'trail', 'bits'):
+            result = solution.solve(self.unique_grid, engine, max_nodes=5)
+            self.assertEqual((result.status, result.nodes), (solution.SolveResult.TIMEOUT, 5))
+            # Propagation only rules out digits that no solution has
+            self.assertTrue(all(expected[box] in value for box, value in result.values.items()))
+            self.assertNotEqual(result.values, solution.grid_values(self.unique_grid))
+        for engine in ('trail', 'bits'):
+            result = solution.solve(self.unique_grid, engine, max_nodes=100000)
+            self.assertEqual(result.status, solution.SolveResult.SOLVED)
+            self.assertEqual(result.values, expected)
+            self.assertGreater(result.nodes, 5)
+        result = solution.solve(TestDiagonalSudoku.diagonal_grid, max_nodes=1)
+        self.assertEqual((result.status, result.nodes), (solution.SolveResult.SOLVED, 1))
+
+    def test_timeout_keeps_the_root_board(self):
+        propagated = bitboard.to_values(bitboard.propagate(bitboard.grid_masks(self.unique_grid)))
+        for engine in ('trail', 'queue'):
+            result = solution.solve(self.unique_grid, engine, max_nodes=1)
+            self.assertEqual(result.status, solution.SolveResult.TIMEOUT)
+            self.assertEqual(result.values, propagated)
+
+    def test_deadline(self):
+        for engine in ('dict', 'trail'):
+            result = solution.solve(self.unique_grid, engine, deadline_ms=0)
+            self.assertEqual((result.status, result.nodes), (solution.SolveResult.TIMEOUT, 0))
+            self.assertEqual(result.values, solution.grid_values(self.unique_grid))
+        self.assertEqual(solution.solve(self.unique_grid, 'trail', deadline_ms=10000).status,
+                         solution.SolveResult.SOLVED)
+
+    def test_unsolvable(self):
+        result = solution.solve('11' + '.' * 79, 'queue', max_nodes=100)
+        self.assertEqual(result.status, solution.SolveResult.UNSOLVABLE)
+        self.assertFalse(result.values)
+        # Without a node to propagate in, the contradiction goes unnoticed
+        result = solution.solve('11' + '.' * 79, 'queue', max_nodes=0)
+        self.assertEqual(result.status, solution.SolveResult.TIMEOUT)
+        self.assertRaises(ValueError, solution.solve, self.unique_grid, 'dlx', max_nodes=10)
+        self.assertRaises(ValueError, solution.solve, self.unique_grid, max_nodes=10, workers=2)
+
+
+class TestAssignmentTracer(unittest.TestCase):
+    diagonal_grid = TestDiagonalSudoku.diagonal_grid
+    hard_grid = testdata.hard_grid
+
+    def test_replay_ends_on_solution(self):
+        for grid in (self.diagonal_grid, self.hard_grid):
+            tracer = solution.AssignmentTracer()
+            solved = solution.solve(grid, tracer=tracer)
+            boards = list(tracer.replay(solved_only=False))
+            self.assertEqual(boards[0], solution.grid_values(grid))
+            self.assertEqual(boards[-1], solved)
+            self.assertEqual(len(boards), len(tracer.diffs) + 1)
+
+    def test_ring_buffer_folds_dropped_diffs(self):
+        tracer = solution.AssignmentTracer(maxlen=50)
+        solved = solution.solve(self.hard_grid, tracer=tracer)
+        self.assertEqual(len(tracer.diffs), 50)
+        self.assertGreater(tracer.dropped, 0)
+        self.assertEqual(list(tracer.replay(solved_only=False))[-1], solved)
+
+    def test_no_recording_by_default(self):
+        self.assertFalse(hasattr(solution, 'assignments'))
+        self.assertEqual(solution.assign_value({'A1': '12'}, 'A1', '1'), {'A1': '1'})
+
+
 if __name__ == '__main__':
     unittest.main()
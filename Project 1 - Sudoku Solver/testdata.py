@@ -0,0 +1,20 @@
+"""
+Puzzles and boards shared by the unit tests.
+"""
+
+import solution
+
+# The diagonal puzzle of the project and its solution
+diagonal_grid = '2.............62....1....7...6..8...3...9...7...6..4...4....8....52.............3'
+diagonal_solution = '267945381853716249491823576576438192384192657129657438642379815935281764718564923'
+
+# A diagonal puzzle with several solutions, hard for propagation
+hard_grid = '9.1....8.8.5.7..4.2.4....6...7......5..............83.3..6......9................'
+
+# A unique 17 clue diagonal puzzle that propagation alone cannot finish
+unique_grid = '2...4...18..7.62.....8.......6...1....4....5.........8.....9.....5..1.6..........'
+
+
+def empty_board():
+    """Return a board in dictionary form with every digit possible in every box."""
+    return dict((box, '123456789') for box in solution.boxes)
@@ -6,31 +6,27 @@ Created on Tue Jun 20 15:41:42 2017
 @author: bernhardmayr
 """
 
-def cross(A, B):
-    "Cross product of elements in A and elements in B."
-    return [s+t for s in A for t in B]
+from geometry import cross, standard
 
 def reverse_string(string):
     "Return the backwards representation of a string"
     return string[::-1]
 
-rows = 'ABCDEFGHI'
-cols = '123456789'
+# The tables of the diagonal 9x9 sudoku, built by geometry.Geometry
+rows = standard.rows
+cols = ''.join(standard.cols)
 
-boxes = cross(rows, cols)
+boxes = standard.boxes
 
-row_units = [cross(r, cols) for r in rows]
-column_units = [cross(rows, c) for c in cols]
-square_units = [cross(rs, cs) for rs in ('ABC','DEF','GHI') for cs in ('123','456','789')]
+unitlist = standard.unitlist
+row_units = unitlist[0:9]
+column_units = unitlist[9:18]
+square_units = unitlist[18:27]
+right_diagonal_units = unitlist[27:28]
+left_diagonal_units = unitlist[28:29]
 
-# adding units for diagonal constraints
-right_diagonal_units = [sum([cross(r, str(i+1)) for i, r in enumerate(rows)], [])]
-left_diagonal_units = [sum([cross(r, str(i + 1)) for i, r in enumerate(reverse_string(rows))], [])]
-
-unitlist = row_units + column_units + square_units + right_diagonal_units + left_diagonal_units
-
-units = dict((s, [u for u in unitlist if s in u]) for s in boxes)
-peers = dict((s, set(sum(units[s],[]))-set([s])) for s in boxes)
+units = standard.units
+peers = standard.peers
 
 def display(values):
     """
@@ -0,0 +1,179 @@
+"""
+NumPy batch propagation for the bitmask engine.
+
+A block of N puzzles is held as an (N, 81) uint16 array of candidate masks in
+the layout of bitboard.py. Each round runs eliminate, only choice and naked
+twins on every puzzle at once, gathering the boxes of `unitlist` through index
+arrays. Rounds repeat on the puzzles that still changed; puzzles propagation
+cannot finish fall through to the scalar search of bitboard.py.
+
+NumPy is optional: the module imports without it, but calling into it raises
+ImportError.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import bitboard
+
+ALL = bitboard.ALL
+
+tables = None
+
+
+def build_tables():
+    """
+    Build the index arrays, once per process.
+    Returns:
+        A dict with the unit index array (29, 9), the units of every box and
+        the position of the box in them, both padded to (81, 5) with a dummy
+        unit of zeros at index 29, and a popcount lookup for every mask.
+    """
+    if np is None:
+        raise ImportError('The NumPy engine requires numpy')
+    width = max(len(u) for u in bitboard.cell_units)
+    dummy = len(bitboard.unit_cells)
+    cell_units = np.full((len(bitboard.boxes), width), dummy, dtype=np.intp)
+    cell_pos = np.zeros((len(bitboard.boxes), width), dtype=np.intp)
+    for i, units in enumerate(bitboard.cell_units):
+        for k, u in enumerate(units):
+            cell_units[i, k] = u
+            cell_pos[i, k] = bitboard.unit_cells[u].index(i)
+    return {
+        'units': np.array(bitboard.unit_cells, dtype=np.intp),
+        'cell_units': cell_units,
+        'cell_pos': cell_pos,
+        'popcount': np.array(bitboard.bit_count, dtype=np.uint8),
+        'not_self': ~np.eye(len(bitboard.digits), dtype=bool),
+    }
+
+
+def get_tables():
+    """Return the index arrays, building them on first use."""
+    global tables
+    if tables is None:
+        tables = build_tables()
+    return tables
+
+
+def scatter(per_unit, t):
+    """
+    OR a (n, 29, 9) array of per-unit box values into (n, 81) box values.
+    Every box receives the values of all of its units.
+    """
+    padded = np.concatenate([per_unit, np.zeros_like(per_unit[:, :1])], axis=1)
+    return np.bitwise_or.reduce(padded[:, t['cell_units'], t['cell_pos']], axis=2)
+
+
+def eliminate(X, t):
+    """
+    Remove the digits of the solved boxes of every unit from the other boxes.
+    Returns:
+        The new masks and a boolean array of puzzles with a unit holding a digit twice.
+    """
+    pop = t['popcount']
+    U = X[:, t['units']]
+    single = pop[U] == 1
+    solved = np.bitwise_or.reduce(np.where(single, U, 0), axis=2)
+    bad = (pop[solved] != single.sum(axis=2)).any(axis=1)
+    removal = scatter(np.broadcast_to(solved[:, :, None], U.shape), t)
+    return np.where(pop[X] == 1, X, X & ~removal), bad
+
+
+def only_choice(X, t):
+    """
+    Assign every digit that only fits in one box of a unit.
+    Returns:
+        The new masks and a boolean array of puzzles where a unit lost a digit
+        or a box is the only place for two digits.
+    """
+    pop = t['popcount']
+    U = X[:, t['units']]
+    once = np.zeros(U.shape[:2], dtype=X.dtype)
+    twice = np.zeros_like(once)
+    for k in range(U.shape[2]):
+        column = U[:, :, k]
+        twice |= once & column
+        once |= column
+    bad = (once != ALL).any(axis=1)
+    hits = U & (once & ~twice)[:, :, None]
+    forced = scatter(hits, t)
+    bad |= (pop[forced] > 1).any(axis=1)
+    return np.where(forced != 0, forced, X), bad
+
+
+def naked_twins(X, t):
+    """
+    Remove the digits of every pair of boxes sharing the same two candidates
+    from the other boxes of their unit.
+    Returns:
+        The new masks and a boolean array of puzzles flagged as contradictory (none).
+    """
+    pop = t['popcount']
+    U = X[:, t['units']]
+    two = pop[U] == 2
+    twins = ((U[:, :, :, None] == U[:, :, None, :]) & two[:, :, :, None] & two[:, :, None, :]
+             & t['not_self'])
+    is_twin = twins.any(axis=3)
+    twin_masks = np.bitwise_or.reduce(np.where(is_twin, U, 0), axis=2)
+    removal = np.where(is_twin, 0, twin_masks[:, :, None])
+    return X & ~scatter(removal, t), np.zeros(len(X), dtype=bool)
+
+
+strategies = (eliminate, only_choice, naked_twins)
+
+
+def reduce_batch(X):
+    """
+    Propagate a block of puzzles until none of them changes.
+    Args:
+        X: (N, 81) uint16 array of candidate masks.
+    Returns:
+        The propagated masks and a boolean array of the puzzles found unsolvable,
+        whose masks are zeroed.
+    """
+    t = get_tables()
+    X = np.array(X, dtype=np.uint16)
+    dead = np.zeros(len(X), dtype=bool)
+    active = np.arange(len(X))
+    while active.size:
+        before = X[active]
+        sub = before
+        bad = np.zeros(len(sub), dtype=bool)
+        for strategy in strategies:
+            sub, failed = strategy(sub, t)
+            bad |= failed
+        bad |= (sub == 0).any(axis=1)
+        sub[bad] = 0
+        X[active] = sub
+        dead[active[bad]] = True
+        # Only the puzzles that changed this round can change in the next one
+        active = active[(sub != before).any(axis=1) & ~bad]
+    return X, dead
+
+
+def solve_block(blocks):
+    """
+    Solve a list of candidate mask lists.
+    Args:
+        blocks(list): boards of bitboard.py, lists of 81 masks.
+    Returns:
+        A list with the solved masks or False for each board.
+    """
+    if not blocks:
+        return []
+    X, dead = reduce_batch(blocks)
+    pop = get_tables()['popcount']
+    solved = (pop[X] == 1).all(axis=1)
+    results = []
+    for row, is_dead, is_solved in zip(X.tolist(), dead.tolist(), solved.tolist()):
+        if is_dead:
+            results.append(False)
+        elif is_solved:
+            results.append(row)
+        else:
+            # Propagation stalled, branch on the scalar engine
+            results.append(bitboard.solve_cells(row, 'queue'))
+    return results
@@ -0,0 +1,45 @@
+import batch
+import bitboard
+import testdata
+import unittest
+import vectorized
+
+
+@unittest.skipIf(vectorized.np is None, "numpy is not installed")
+class TestVectorized(unittest.TestCase):
+    diagonal_grid = testdata.diagonal_grid
+    hard_grid = testdata.hard_grid
+
+    def test_reduce_batch_matches_scalar_propagation(self):
+        grids = [self.diagonal_grid, self.hard_grid, '.' * 81]
+        X, dead = vectorized.reduce_batch([bitboard.grid_masks(grid) for grid in grids])
+        self.assertFalse(dead.any())
+        self.assertEqual(X[0].tolist(), bitboard.propagate(bitboard.grid_masks(self.diagonal_grid)))
+        self.assertEqual(X[2].tolist(), [bitboard.ALL] * 81)
+
+    def test_contradictions(self):
+        X, dead = vectorized.reduce_batch([bitboard.grid_masks('11' + '.' * 79),
+                                           bitboard.grid_masks(self.diagonal_grid)])
+        self.assertEqual(dead.tolist(), [True, False])
+
+    def test_naked_twins(self):
+        cells = [bitboard.ALL] * 81
+        cells[0] = cells[1] = bitboard.digit_mask['1'] | bitboard.digit_mask['2']
+        X, _ = vectorized.naked_twins(vectorized.np.array([cells], dtype=vectorized.np.uint16),
+                                      vectorized.get_tables())
+        self.assertEqual(X[0, 0], cells[0])
+        # The rest of row A and of the top left square lose 1 and 2
+        self.assertEqual(bitboard.mask_digits[X[0, 8]], '3456789')
+        self.assertEqual(bitboard.mask_digits[X[0, 9]], '3456789')
+        # A1 and A2 share no column or diagonal
+        self.assertEqual(X[0, 80], bitboard.ALL)
+        self.assertEqual(X[0, 72], bitboard.ALL)
+
+    def test_batch_matches_scalar(self):
+        grids = [self.diagonal_grid, 'bad', '11' + '.' * 79, self.hard_grid]
+        self.assertEqual(list(batch.solve_many(grids, chunksize=3, propagation='numpy')),
+                         list(batch.solve_many(grids)))
+
+
+if __name__ == '__main__':
+    unittest.main()
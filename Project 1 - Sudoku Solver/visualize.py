@@ -1,17 +1,10 @@
-from PySudoku import play
+from renderer import export_gif, play
 
-def visualize_assignments(assignments):
-    """ Visualizes the set of assignments created by the Sudoku AI"""
-    last_assignment = None
-    filtered_assignments = []
+def visualize_assignments(tracer):
+    """ Visualizes the assignments recorded by an AssignmentTracer during a solve"""
+    # Only replay the boards where a box got solved
+    play(tracer.replay(solved_only=True))
 
-    for i in range(len(assignments)):
-        if last_assignment:
-            last_assignment_items = [item for item in last_assignment.items() if len(item[1]) == 1]
-            current_assignment_items = [item for item in assignments[i].items() if len(item[1]) == 1]
-            shared_items = set(last_assignment_items) & set(current_assignment_items)
-            if len(shared_items) < len(current_assignment_items):
-                filtered_assignments.append(assignments[i])
-        last_assignment = assignments[i]
-
-    play(filtered_assignments)
+def export_assignments(tracer, path, fps=5):
+    """ Saves the assignments recorded by an AssignmentTracer as an animated GIF, without a display"""
+    return export_gif(tracer.replay(solved_only=True), path, fps)